@@ -0,0 +1,195 @@
+"""Token and wall-time accounting per agent, graph node, tool and thread.
+
+Every LLM call and tool call is recorded against a (kind, name, thread) key,
+e.g. ("agent", "Search Agent", thread) for Swarm or ("node", "agent", thread)
+for LangGraph. Totals are aggregated in memory and the increments flushed to
+a local sink every USAGE_FLUSH_INTERVAL seconds and at exit:
+
+    USAGE_LEDGER=jsonl    append one JSON object per key and flush window to
+                          USAGE_LEDGER_PATH (default .cache/usage.jsonl)
+    USAGE_LEDGER=sqlite   insert the same rows into USAGE_LEDGER_PATH
+                          (default .cache/usage.sqlite)
+
+`python -m cli.usage` summarizes the sink. When USAGE_LEDGER is off (the
+default) recording still updates the in-memory totals, which cost a dict
+update per call.
+"""
+
+import atexit
+import contextvars
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+FIELDS = ("calls", "prompt_tokens", "completion_tokens", "cached_tokens", "wall_ms")
+
+_thread = contextvars.ContextVar("accounting_thread", default=None)
+
+
+class JsonlUsageSink:
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, rows: list) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(row) + "\n" for row in rows)
+
+    def read(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class SQLiteUsageSink:
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS usage ("
+                "ts REAL NOT NULL, kind TEXT NOT NULL, name TEXT NOT NULL, "
+                "thread_id TEXT, calls INTEGER, prompt_tokens INTEGER, "
+                "completion_tokens INTEGER, cached_tokens INTEGER, wall_ms REAL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def write(self, rows: list) -> None:
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO usage VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (row["ts"], row["kind"], row["name"], row["thread_id"])
+                    + tuple(row[field] for field in FIELDS)
+                    for row in rows
+                ],
+            )
+
+    def read(self):
+        if not os.path.exists(self.path):
+            return
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            yield from (dict(row) for row in conn.execute("SELECT * FROM usage"))
+        finally:
+            conn.close()
+
+
+class UsageLedger:
+    """In-memory usage totals with periodic flushes of the increments to a sink."""
+
+    def __init__(self, sink=None, flush_interval: float = 30):
+        self.sink = sink
+        self.flush_interval = flush_interval
+        self.totals = {}
+        self._pending = {}
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, name: str, thread_id: str = None, **amounts) -> None:
+        key = (kind, name, thread_id if thread_id is not None else _thread.get())
+        with self._lock:
+            for table in (self.totals, self._pending):
+                row = table.setdefault(key, dict.fromkeys(FIELDS, 0))
+                row["calls"] += 1
+                for field, amount in amounts.items():
+                    row[field] += amount or 0
+            due = time.monotonic() - self._flushed_at >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushed_at = time.monotonic()
+        if not pending or self.sink is None:
+            return
+        now = time.time()
+        try:
+            self.sink.write(
+                [
+                    dict(ts=now, kind=kind, name=name, thread_id=thread_id, **row)
+                    for (kind, name, thread_id), row in pending.items()
+                ]
+            )
+        except Exception as e:
+            print(f"Could not write usage records: {e}")
+
+    def summary(self, by=("kind", "name"), top: int = 10) -> list:
+        with self._lock:
+            rows = [
+                dict(kind=kind, name=name, thread_id=thread_id, **row)
+                for (kind, name, thread_id), row in self.totals.items()
+            ]
+        return summarize(rows, by=by, top=top)
+
+
+def summarize(rows, by=("kind", "name"), top: int = 10, order="prompt_tokens") -> list:
+    """Sum usage rows per `by` key and return the `top` consumers by `order`."""
+    groups = {}
+    for row in rows:
+        key = tuple(row.get(column) for column in by)
+        total = groups.setdefault(key, dict.fromkeys(FIELDS, 0))
+        for field in FIELDS:
+            total[field] += row.get(field) or 0
+    ranked = sorted(groups.items(), key=lambda item: item[1][order], reverse=True)
+    return [dict(zip(by, key), **total) for key, total in ranked[:top]]
+
+
+def sink(mode=None, path=None):
+    """Build the sink named by USAGE_LEDGER (or `mode`), or None when off."""
+    mode = (mode or os.getenv("USAGE_LEDGER", "off")).lower()
+    if mode == "jsonl":
+        return JsonlUsageSink(
+            path or os.getenv("USAGE_LEDGER_PATH", ".cache/usage.jsonl")
+        )
+    if mode == "sqlite":
+        return SQLiteUsageSink(
+            path or os.getenv("USAGE_LEDGER_PATH", ".cache/usage.sqlite")
+        )
+    return None
+
+
+ledger = UsageLedger(
+    sink=sink(), flush_interval=float(os.getenv("USAGE_FLUSH_INTERVAL", "30"))
+)
+atexit.register(ledger.flush)
+
+
+def record(kind: str, name: str, thread_id: str = None, **amounts) -> None:
+    """Add one call's prompt_tokens, completion_tokens, cached_tokens and wall_ms."""
+    ledger.record(kind, name, thread_id, **amounts)
+
+
+@contextmanager
+def timed(kind: str, name: str, thread_id: str = None):
+    """Record one call of `name` with the wall time of the block."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(kind, name, thread_id, wall_ms=(time.perf_counter() - start) * 1000)
+
+
+@contextmanager
+def thread_scope(thread_id: str):
+    """Attribute usage recorded inside the block (and tasks it starts) to thread_id."""
+    token = _thread.set(thread_id)
+    try:
+        yield
+    finally:
+        _thread.reset(token)
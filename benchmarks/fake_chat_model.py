@@ -0,0 +1,82 @@
+"""Chat model that replays a scripted agent turn without calling an LLM.
+
+When the last message is from the user it requests the scripted tool calls;
+once tool results are in it streams the scripted answer word by word. This
+drives `langgraph_agents.main.app` through a full agent → tools → agent turn.
+"""
+
+import json
+import re
+import time
+import uuid
+
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, ToolMessage
+from langchain_core.messages.tool import tool_call_chunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class ScriptedChatModel(BaseChatModel):
+    tool_calls: List[dict] = [{"name": "search", "args": {"query": "jazz concert posters"}}]
+    answer: str = "Here are some jazz concert posters from the collections."
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs: Any):
+        return self
+
+    def _next_message(self, messages: List[BaseMessage]) -> AIMessage:
+        if self.latency:
+            time.sleep(self.latency)
+        if messages and isinstance(messages[-1], ToolMessage):
+            return AIMessage(content=self.answer)
+        return AIMessage(
+            content="",
+            tool_calls=[
+                dict(call, id=f"call_{uuid.uuid4().hex[:12]}", type="tool_call")
+                for call in self.tool_calls
+            ],
+        )
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=self._next_message(messages))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        message = self._next_message(messages)
+        for token in re.split(r"(\s)", message.content) if message.content else []:
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+        if message.tool_calls:
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(
+                    content="",
+                    tool_call_chunks=[
+                        tool_call_chunk(
+                            name=call["name"],
+                            args=json.dumps(call["args"]),
+                            id=call["id"],
+                            index=i,
+                        )
+                        for i, call in enumerate(message.tool_calls)
+                    ],
+                )
+            )
@@ -0,0 +1,82 @@
+"""Measure cold import time of the agent entry points and prove they stay offline.
+
+Each module is imported in a fresh interpreter with socket connections and DNS
+lookups replaced by a guard that records the attempt and raises. The run fails
+if any import tries to reach the network.
+
+    uv run python -m benchmarks.import_time
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+MODULES = [
+    "langgraph_agents.main",
+    "swarm_agents.main",
+    "opensearch_client",
+    "utils",
+]
+
+GUARD = """
+import json, socket, sys, time
+
+attempts = []
+
+def guard(name):
+    def blocked(*args, **kwargs):
+        attempts.append(f"{name}{args[1:2] if name == 'connect' else args[:1]}")
+        raise OSError(f"network access during import: {name}")
+    return blocked
+
+socket.socket.connect = guard("connect")
+socket.socket.connect_ex = guard("connect")
+socket.getaddrinfo = guard("getaddrinfo")
+socket.create_connection = guard("create_connection")
+
+start = time.perf_counter()
+error = None
+try:
+    __import__(sys.argv[1])
+except Exception as e:
+    error = repr(e)
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "network": attempts, "error": error}))
+"""
+
+
+def measure(module, repeat=3):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", GUARD, module],
+            cwd=root,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        runs.append(json.loads(output.stdout.strip().splitlines()[-1]))
+    return runs
+
+
+def main():
+    failed = False
+    for module in MODULES:
+        runs = measure(module)
+        best = min(run["seconds"] for run in runs)
+        network = sorted({attempt for run in runs for attempt in run["network"]})
+        error = runs[0]["error"]
+        status = "ok" if not network and not error else "FAIL"
+        failed = failed or status == "FAIL"
+        print(f"{status:4} {module:28} {best * 1000:8.1f} ms")
+        for attempt in network:
+            print(f"     network access: {attempt}")
+        if error:
+            print(f"     import error: {error}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Micro-benchmark of OpenSearch request encoding and response decoding.
+
+Compares the stdlib JSONSerializer with OrjsonSerializer for the hybrid query
+request bodies, and the decoding of full responses with `filter_path`-trimmed
+ones, at 20 and 200 hits. Reports CPU time and peak allocations per
+operation:
+
+    uv run python -m benchmarks.serialization
+"""
+
+import argparse
+import json
+import time
+
+from benchmarks.stub_opensearch import filter_response, synthetic_search_response
+from benchmarks.suite import measure
+from opensearch_client import OrjsonSerializer, orjson
+from opensearch_neural_search import (
+    MSEARCH_FILTER_PATH,
+    SEARCH_FILTER_PATH,
+    OpenSearchNeuralSearch,
+)
+from opensearchpy import JSONSerializer
+from opensearchpy.client.utils import _bulk_body
+
+QUERIES = [
+    "jazz concert posters",
+    "Berkeley Folk Music Festival performers",
+    "Willie Mays",
+    "menus from transatlantic flights",
+]
+
+
+def cases(store, hits):
+    serializers = {"json": JSONSerializer()}
+    if orjson is not None:
+        serializers["orjson"] = OrjsonSerializer()
+
+    search_body = store._similarity_search_dsl(QUERIES[0], 40, size=hits)
+    msearch_body = store._msearch_body(
+        QUERIES, 40, store._similarity_search_dsl, size=hits
+    )
+    response = synthetic_search_response(hits)
+    msearch_response = {
+        "took": 15,
+        "responses": [dict(response, status=200) for _ in QUERIES],
+    }
+    payloads = {
+        "full": (json.dumps(response), json.dumps(msearch_response)),
+        "filter_path": (
+            json.dumps(filter_response(response, SEARCH_FILTER_PATH)),
+            json.dumps(filter_response(msearch_response, MSEARCH_FILTER_PATH)),
+        ),
+    }
+
+    for name, serializer in serializers.items():
+        yield f"encode search {name}", lambda s=serializer: s.dumps(search_body)
+        yield f"encode msearch {name}", lambda s=serializer: _bulk_body(
+            s, msearch_body
+        )
+        for shape, (search_raw, msearch_raw) in payloads.items():
+            yield f"decode search {name} {shape}", lambda s=serializer, r=search_raw: (
+                s.loads(r)["hits"]["hits"]
+            )
+            yield f"decode msearch {name} {shape}", lambda s=serializer, r=msearch_raw: [
+                item["hits"]["hits"] for item in s.loads(r)["responses"]
+            ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    store = OpenSearchNeuralSearch(
+        endpoint="localhost", index="dc-v2-work", model_id="benchmark-model"
+    )
+    print(f"{'benchmark':40} {'p50 µs':>9} {'p95 µs':>9} {'p99 µs':>9} {'alloc KiB':>10}")
+    for hits in (20, 200):
+        print(f"-- {hits} hits")
+        for name, func in cases(store, hits):
+            result = measure(name, func, args.iterations, clock=time.process_time)
+            print(
+                f"{name:40} {result['p50_ms'] * 1000:9.1f} {result['p95_ms'] * 1000:9.1f} "
+                f"{result['p99_ms'] * 1000:9.1f} {result['peak_alloc_kib']:10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
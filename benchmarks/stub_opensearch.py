@@ -0,0 +1,230 @@
+"""Local HTTP stand-in for the OpenSearch endpoints the agents call.
+
+Serves recorded `_search`, `_msearch` (and their `/template` variants),
+aggregation and ML Commons predict responses after a fixed latency so search
+code can be benchmarked without a cluster or network.
+Responses are loaded from `search.json` and `aggregations.json` in a fixtures
+directory when given (e.g. responses saved from a real domain), otherwise
+synthetic responses shaped like the dc-v2-work index are generated.
+"""
+
+import json
+import os
+import random
+import socket
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+WORDS = (
+    "photograph festival poster letter map portrait campus jazz folk concert "
+    "manuscript library archive river chicago evanston africa travel menu"
+).split()
+
+
+def synthetic_search_response(hits=20, seed=0):
+    rng = random.Random(seed)
+    return {
+        "took": 12,
+        "timed_out": False,
+        "hits": {
+            "total": {"value": 1000, "relation": "gte"},
+            "max_score": 1.0,
+            "hits": [
+                {
+                    "_index": "dc-v2-work",
+                    "_id": f"work-{seed}-{i}",
+                    "_score": round(1.0 - i / (hits + 1), 4),
+                    "_source": {
+                        "id": f"work-{seed}-{i}",
+                        "title": " ".join(rng.choices(WORDS, k=6)).title(),
+                        "alternative_title": [" ".join(rng.choices(WORDS, k=4))],
+                        "description": [" ".join(rng.choices(WORDS, k=120))],
+                    },
+                }
+                for i in range(hits)
+            ],
+        },
+    }
+
+
+def synthetic_aggregations_response(buckets=10):
+    return {
+        "took": 4,
+        "timed_out": False,
+        "hits": {"total": {"value": 1000, "relation": "gte"}, "hits": []},
+        "aggregations": {
+            "aggregation_result": {
+                "doc_count_error_upper_bound": 0,
+                "sum_other_doc_count": 0,
+                "buckets": [
+                    {"key": WORDS[i % len(WORDS)], "doc_count": 1000 // (i + 1)}
+                    for i in range(buckets)
+                ],
+            }
+        },
+    }
+
+
+def predict_response(texts, dimension=384):
+    """ML Commons text_embedding predict response with a vector per text."""
+    return {
+        "inference_results": [
+            {
+                "output": [
+                    {
+                        "name": "sentence_embedding",
+                        "data_type": "FLOAT32",
+                        "shape": [dimension],
+                        "data": [
+                            random.Random(text).uniform(-1, 1) for _ in range(dimension)
+                        ],
+                    }
+                ]
+            }
+            for text in texts
+        ]
+    }
+
+
+def stats_response(index="dc-v2-work"):
+    shard = {"routing": {"primary": True}, "seq_no": {"max_seq_no": 999}}
+    primaries = {"docs": {"count": 1000, "deleted": 0}}
+    return {"indices": {index: {"primaries": primaries, "shards": {"0": [shard]}}}}
+
+
+def filter_response(data, filter_path: str):
+    """Apply an OpenSearch `filter_path` (comma-separated dotted paths)."""
+    paths = [path.split(".") for path in filter_path.split(",") if path]
+    return _filter(data, paths)
+
+
+def _filter(data, paths):
+    if any(not path for path in paths):
+        return data
+    if isinstance(data, list):
+        items = [_filter(item, paths) for item in data]
+        return [item for item in items if item not in (None, {}, [])]
+    if not isinstance(data, dict):
+        return None
+    result = {}
+    for key, value in data.items():
+        nested = [path[1:] for path in paths if path[0] == key]
+        if nested:
+            value = _filter(value, nested)
+            if value not in (None, {}, []):
+                result[key] = value
+    return result
+
+
+def load_fixtures(directory=None, hits=20):
+    fixtures = {
+        "search": synthetic_search_response(hits),
+        "aggregations": synthetic_aggregations_response(),
+    }
+    for name in fixtures:
+        path = os.path.join(directory or "", f"{name}.json")
+        if directory and os.path.exists(path):
+            with open(path) as f:
+                fixtures[name] = json.load(f)
+    return fixtures
+
+
+class StubOpenSearch:
+    """Threaded HTTP server answering like an OpenSearch domain.
+
+        with StubOpenSearch(latency=0.02) as stub:
+            client = OpenSearch(hosts=[stub.url])
+    """
+
+    def __init__(self, latency=0.0, fixtures=None, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.fixtures = fixtures or load_fixtures()
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # Headers and body are separate writes; don't let Nagle's
+                # algorithm hold the body back for a delayed ACK
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self._respond()
+
+            def do_POST(self):
+                self._respond()
+
+            def _respond(self):
+                length = int(self.headers.get("content-length") or 0)
+                body = self.rfile.read(length) if length else b""
+                stub.requests += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                response = stub.response(self.path, body)
+                query = parse_qs(urlparse(self.path).query)
+                if "filter_path" in query:
+                    response = filter_response(response, query["filter_path"][0])
+                payload = json.dumps(response).encode()
+                self.send_response(200)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def response(self, path, body: bytes):
+        path = path.split("?", 1)[0].removesuffix("/template")
+        if path.endswith("/_msearch"):
+            lines = [json.loads(line) for line in body.splitlines() if line.strip()]
+            return {
+                "took": 15,
+                "responses": [
+                    dict(self._search(request), status=200) for request in lines[1::2]
+                ],
+            }
+        if path.endswith("/_search"):
+            return self._search(json.loads(body) if body else {})
+        if "/_plugins/_ml/_predict/" in path:
+            return predict_response(json.loads(body)["text_docs"])
+        if "/_stats" in path:
+            return stats_response()
+        return {"version": {"number": "2.17.0"}, "tagline": "stub"}
+
+    def _search(self, request: dict):
+        if request.get("aggs"):
+            return self.fixtures["aggregations"]
+        return self.fixtures["search"]
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self.server.serve_forever, name="stub-opensearch", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,206 @@
+"""Offline latency and allocation benchmarks for the search and agent paths.
+
+OpenSearch is replaced by a local HTTP stub serving recorded responses after a
+configurable latency, and the chat model by a scripted one, so the suite runs
+anywhere without credentials or network:
+
+    uv run python -m benchmarks.suite
+    uv run python -m benchmarks.suite --latency-ms 20 --json results.json
+
+Each benchmark reports p50/p95/p99 wall time and the peak traced allocation
+per operation. Compare the numbers (or the --json output) before and after a
+change.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.fake_chat_model import ScriptedChatModel
+from benchmarks.stub_opensearch import StubOpenSearch, load_fixtures
+
+QUERY = "jazz concert posters from the Berkeley Folk Music Festival"
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    index = min(int(round(p / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def measure(
+    name, func, iterations, warmup=5, alloc_iterations=20, clock=time.perf_counter
+):
+    for _ in range(warmup):
+        func()
+
+    timings = []
+    for _ in range(iterations):
+        start = clock()
+        func()
+        timings.append(clock() - start)
+
+    # Allocations are traced in a separate pass so tracing doesn't skew timings
+    peaks = []
+    tracemalloc.start()
+    for _ in range(min(alloc_iterations, iterations)):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        func()
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+
+    return {
+        "name": name,
+        "iterations": iterations,
+        "p50_ms": percentile(timings, 50) * 1000,
+        "p95_ms": percentile(timings, 95) * 1000,
+        "p99_ms": percentile(timings, 99) * 1000,
+        "mean_ms": statistics.fmean(timings) * 1000,
+        "peak_alloc_kib": statistics.fmean(peaks) / 1024,
+    }
+
+
+def vector_store(url, **kwargs):
+    from opensearch_client import PooledRequestsHttpConnection, serializer
+    from opensearch_neural_search import OpenSearchNeuralSearch
+    from opensearchpy import OpenSearch
+
+    client = OpenSearch(
+        hosts=[url],
+        connection_class=PooledRequestsHttpConnection,
+        serializer=serializer(),
+    )
+    # No result cache: every call goes over HTTP to the stub
+    return OpenSearchNeuralSearch(
+        endpoint=url,
+        index="dc-v2-work",
+        model_id="benchmark-model",
+        client=client,
+        async_client=None,
+        text_field="id",
+        **kwargs,
+    )
+
+
+def knn_vector_store(url):
+    from embeddings import QueryEmbedder
+    from search_cache import SearchCache
+
+    # Query vectors are cached after the first call; search results are not
+    store = vector_store(url)
+    store.embedder = QueryEmbedder(store.client, "benchmark-model", cache=SearchCache())
+    return store
+
+
+def fusion_vector_store(url):
+    from fusion import Fusion
+
+    # Both legs go out in one _msearch and are fused client-side
+    return vector_store(url, fusion=Fusion())
+
+
+def benchmarks(
+    store, model_latency, template_store=None, knn_store=None, fusion_store=None
+):
+    from fusion import Fusion
+    from hybrid_query import hybrid_query
+    from search_results import compact_results
+    from services import services
+
+    # The agents read their clients from the shared container
+    services.__dict__["opensearch_vector_store"] = store
+    services.__dict__["chat_model"] = ScriptedChatModel(latency=model_latency)
+
+    from langchain_core.messages import HumanMessage
+    from langgraph_agents.main import app
+
+    docs = store.similarity_search_with_score(QUERY, size=20)
+    response = store.client.search(index=store.index, body={})
+    legs = [response["hits"]["hits"], list(reversed(response["hits"]["hits"]))]
+    turns = iter(range(sys.maxsize))
+
+    def app_turn():
+        app.invoke(
+            {"messages": [HumanMessage(content=QUERY)]},
+            config={"configurable": {"thread_id": f"benchmark-{next(turns)}"}},
+        )
+
+    return {
+        "hybrid_query": lambda: hybrid_query(QUERY, model_id="benchmark-model", size=20),
+        "similarity_search_with_score": lambda: store.similarity_search_with_score(
+            QUERY, size=20
+        ),
+        "similarity_search_with_score (template)": lambda: (
+            template_store.similarity_search_with_score(QUERY, size=20)
+        ),
+        "similarity_search_with_score (knn)": lambda: (
+            knn_store.similarity_search_with_score(QUERY, size=20)
+        ),
+        "similarity_search_with_score (client fusion)": lambda: (
+            fusion_store.similarity_search_with_score(QUERY, size=20)
+        ),
+        "Fusion.fuse weighted (2x20 hits)": lambda: Fusion().fuse(legs, 20),
+        "Fusion.fuse rrf (2x20 hits)": lambda: Fusion("rrf").fuse(legs, 20),
+        "compact_results (20 hits)": lambda: compact_results(docs),
+        "json.dumps documents (20 hits)": lambda: json.dumps(docs, default=str),
+        "langgraph app turn": app_turn,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=5, help="stub OpenSearch latency")
+    parser.add_argument("--model-latency-ms", type=float, default=0, help="scripted model latency")
+    parser.add_argument("--hits", type=int, default=20, help="hits in synthetic search responses")
+    parser.add_argument("--fixtures", help="directory with recorded search.json / aggregations.json")
+    parser.add_argument("--only", help="run only benchmarks whose name contains this text")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    # Keep the graph's checkpoints out of the working tree
+    checkpoints = tempfile.TemporaryDirectory()
+    os.environ["LANGGRAPH_CHECKPOINT_PATH"] = os.path.join(checkpoints.name, "checkpoints.sqlite")
+
+    stub = StubOpenSearch(
+        latency=args.latency_ms / 1000,
+        fixtures=load_fixtures(args.fixtures, hits=args.hits),
+    )
+    results = []
+    with stub:
+        suite = benchmarks(
+            vector_store(stub.url),
+            args.model_latency_ms / 1000,
+            template_store=vector_store(stub.url, search_template="hybrid-search"),
+            knn_store=knn_vector_store(stub.url),
+            fusion_store=fusion_vector_store(stub.url),
+        )
+        print(f"{'benchmark':46} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'alloc KiB':>10}")
+        for name, func in suite.items():
+            if args.only and args.only not in name:
+                continue
+            result = measure(name, func, args.iterations)
+            results.append(result)
+            print(
+                f"{name:46} {result['p50_ms']:9.3f} {result['p95_ms']:9.3f} "
+                f"{result['p99_ms']:9.3f} {result['peak_alloc_kib']:10.1f}"
+            )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {"latency_ms": args.latency_ms, "hits": args.hits, "results": results},
+                f,
+                indent=2,
+            )
+    checkpoints.cleanup()
+
+
+if __name__ == "__main__":
+    main()
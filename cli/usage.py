@@ -0,0 +1,67 @@
+"""Report the top token and wall-time consumers recorded in the usage ledger.
+
+    uv run agent-usage                  # by agent, node and tool
+    uv run agent-usage --by thread_id --top 5
+    uv run agent-usage --order wall_ms --sink sqlite --path .cache/usage.sqlite
+"""
+
+import argparse
+
+import accounting
+
+COLUMNS = ("kind", "name", "thread_id")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--by",
+        default="kind,name",
+        help=f"comma-separated grouping columns from {', '.join(COLUMNS)}",
+    )
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument(
+        "--order", default="prompt_tokens", choices=accounting.FIELDS
+    )
+    parser.add_argument("--sink", help="jsonl or sqlite (default: USAGE_LEDGER)")
+    parser.add_argument("--path", help="ledger file (default: USAGE_LEDGER_PATH)")
+    args = parser.parse_args(argv)
+
+    by = tuple(column.strip() for column in args.by.split(",") if column.strip())
+    unknown = set(by) - set(COLUMNS)
+    if unknown:
+        parser.error(f"cannot group by {', '.join(sorted(unknown))}")
+
+    sink = accounting.sink(args.sink, args.path)
+    if sink is None:
+        parser.error("no usage ledger; set USAGE_LEDGER=jsonl or sqlite, or --sink")
+
+    rows = accounting.summarize(sink.read(), by=by, top=args.top, order=args.order)
+    if not rows:
+        print(f"No usage recorded in {sink.path}")
+        return
+
+    widths = [
+        max(len(column), *(len(str(row[column])) for row in rows)) for column in by
+    ]
+    header = "  ".join(column.ljust(width) for column, width in zip(by, widths))
+    print(
+        f"{header}  {'calls':>7} {'prompt':>10} {'completion':>10} "
+        f"{'cached':>10} {'cache %':>7} {'wall s':>9} {'avg ms':>9}"
+    )
+    for row in rows:
+        label = "  ".join(
+            str(row[column]).ljust(width) for column, width in zip(by, widths)
+        )
+        prompt_tokens = row["prompt_tokens"]
+        cached = row["cached_tokens"] / prompt_tokens if prompt_tokens else 0
+        print(
+            f"{label}  {row['calls']:>7} {row['prompt_tokens']:>10} "
+            f"{row['completion_tokens']:>10} {row['cached_tokens']:>10} "
+            f"{cached:>7.0%} {row['wall_ms'] / 1000:>9.2f} "
+            f"{row['wall_ms'] / row['calls']:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
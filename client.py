@@ -1,27 +1,307 @@
+import accounting
+import contextvars
+import json
 import os
+import threading
+import time
+import tracing
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
 from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 from dotenv import load_dotenv
 from openai import AzureOpenAI
+from prompts import layout_messages
 from swarm import Swarm
+from swarm.types import Response
+from swarm.util import debug_print, function_to_json
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Setup token provider
-token_provider = get_bearer_token_provider(
-    DefaultAzureCredential(),
-    os.getenv("AZURE_ENDPOINT_SCOPE", "https://cognitiveservices.azure.com/.default"),
-)
+CONTEXT_VARIABLES = "context_variables"
 
-# Initialize AzureOpenAI client
-azure_client = AzureOpenAI(
-    api_version=os.getenv("AZURE_API_VERSION", "2024-08-01-preview"),
-    azure_endpoint=os.getenv("AZURE_ENDPOINT"),
-    azure_ad_token_provider=token_provider,
-)
 
-from swarm import Swarm
+def azure_client():
+    # Setup token provider
+    token_provider = get_bearer_token_provider(
+        DefaultAzureCredential(),
+        os.getenv(
+            "AZURE_ENDPOINT_SCOPE", "https://cognitiveservices.azure.com/.default"
+        ),
+    )
+
+    # Initialize AzureOpenAI client
+    return AzureOpenAI(
+        api_version=os.getenv("AZURE_API_VERSION", "2024-08-01-preview"),
+        azure_endpoint=os.getenv("AZURE_ENDPOINT"),
+        azure_ad_token_provider=token_provider,
+    )
+
+
+class PromptCachingSwarm(Swarm):
+    """Swarm that lays out prompts so provider-side prompt caching can hit.
+
+    Azure OpenAI reuses the longest prompt prefix it has already processed, so
+    static instructions and tool schemas go first, followed by the history,
+    and the per-turn context of LayeredInstructions goes last. Tool schemas
+    are built once per agent and always listed in the same order. Prompt and
+    cached token counts of each completion, streamed ones included, are added
+    up in `usage`, and every completion and tool call is recorded in the usage
+    ledger under its agent or tool name.
+    """
+
+    def __init__(self, client=None):
+        super().__init__(client=client)
+        self.usage = {"completions": 0, "prompt_tokens": 0, "cached_tokens": 0}
+        self._tools = {}
+        self._usage_lock = threading.Lock()
+
+    def get_chat_completion(
+        self, agent, history, context_variables, model_override, stream, debug
+    ):
+        context_variables = defaultdict(str, context_variables)
+        messages = layout_messages(agent.instructions, history, context_variables)
+        debug_print(debug, "Getting chat completion for...:", messages)
+
+        tools = self._tool_schemas(agent)
+        create_params = {
+            "model": model_override or agent.model,
+            "messages": messages,
+            "tools": tools or None,
+            "tool_choice": agent.tool_choice,
+            "stream": stream,
+        }
+        if tools:
+            create_params["parallel_tool_calls"] = agent.parallel_tool_calls
+        if stream:
+            create_params["stream_options"] = {"include_usage": True}
+
+        start = time.perf_counter()
+        with tracing.span(
+            "swarm.completion", agent=agent.name, messages=len(messages)
+        ) as span:
+            completion = self.client.chat.completions.create(**create_params)
+            if not stream:
+                self._record_usage(
+                    span, agent, completion.usage, time.perf_counter() - start
+                )
+                return completion
+        return self._stream_with_usage(completion, agent, start)
+
+    def handle_tool_calls(self, tool_calls, functions, context_variables, debug):
+        # One call at a time, so each tool's wall time is recorded on its own
+        response = Response(messages=[], agent=None, context_variables={})
+        for tool_call in tool_calls:
+            with accounting.timed("tool", tool_call.function.name):
+                partial_response = super().handle_tool_calls(
+                    [tool_call], functions, context_variables, debug
+                )
+            response.messages.extend(partial_response.messages)
+            response.context_variables.update(partial_response.context_variables)
+            if partial_response.agent:
+                response.agent = partial_response.agent
+        return response
+
+    def _stream_with_usage(self, completion, agent, start: float):
+        # Usage arrives in a last chunk without choices, which Swarm can't
+        # read; record it once the stream ends and pass on only the others
+        usage = None
+        for chunk in completion:
+            if chunk.usage is not None:
+                usage = chunk.usage
+            if chunk.choices:
+                yield chunk
+        self._record_usage(None, agent, usage, time.perf_counter() - start)
+
+    def cache_hit_ratio(self) -> float:
+        """Share of prompt tokens served from the provider's prompt cache."""
+        prompt_tokens = self.usage["prompt_tokens"]
+        return self.usage["cached_tokens"] / prompt_tokens if prompt_tokens else 0.0
+
+    def _tool_schemas(self, agent) -> list:
+        key = tuple(agent.functions)
+        if key not in self._tools:
+            tools = [function_to_json(f) for f in agent.functions]
+            # Hide context_variables from the model, as Swarm does
+            for tool in tools:
+                params = tool["function"]["parameters"]
+                params["properties"].pop(CONTEXT_VARIABLES, None)
+                if CONTEXT_VARIABLES in params["required"]:
+                    params["required"].remove(CONTEXT_VARIABLES)
+            self._tools[key] = tools
+        return self._tools[key]
+
+    def _record_usage(self, span, agent, usage, elapsed: float) -> None:
+        if usage is None:
+            accounting.record("agent", agent.name, wall_ms=elapsed * 1000)
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", None) or 0
+        with self._usage_lock:
+            self.usage["completions"] += 1
+            self.usage["prompt_tokens"] += usage.prompt_tokens
+            self.usage["cached_tokens"] += cached_tokens
+        if span is not None:
+            span.set(prompt_tokens=usage.prompt_tokens, cached_tokens=cached_tokens)
+        accounting.record(
+            "agent",
+            agent.name,
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            cached_tokens=cached_tokens,
+            wall_ms=elapsed * 1000,
+        )
+
+
+class ToolRun:
+    """One concurrent tool call: its copy of the context and when it started."""
+
+    def __init__(self, context_variables: dict):
+        self.snapshot = dict(context_variables)
+        self.context_variables = dict(context_variables)
+        self.started = threading.Event()
+        self.started_at = None
+
+    def start(self) -> None:
+        self.started_at = time.monotonic()
+        self.started.set()
+
+    def apply(self, context_variables: dict) -> None:
+        """Apply the keys the tool set, replaced or deleted to context_variables.
+
+        Changes are found against the context the call started from, so an
+        untouched key never overwrites an update applied by an earlier call.
+        """
+        context_variables.update(
+            {
+                key: value
+                for key, value in self.context_variables.items()
+                if key not in self.snapshot or self.snapshot[key] is not value
+            }
+        )
+        for key in self.snapshot.keys() - self.context_variables.keys():
+            context_variables.pop(key, None)
+
+
+class ConcurrentSwarm(PromptCachingSwarm):
+    """Swarm that runs the tool calls of one assistant message concurrently.
+
+    Tool calls in one message are treated as independent: each runs on the
+    shared thread pool against its own copy of `context_variables`. Tool
+    messages, context updates (including deleted keys) and agent handoffs are
+    then applied in the original tool-call order, so the outcome is the same
+    as running them one after another. A call that fails, or runs longer than
+    `tool_timeout` seconds from when a worker starts it, is reported to the
+    model as an error tool message. Threads can't be killed, so a timed-out
+    call is abandoned rather than stopped: it keeps its worker until it
+    returns, and changes to its context copy are discarded.
+    """
+
+    def __init__(self, client=None, max_workers: int = 8, tool_timeout: float = 30):
+        super().__init__(client=client)
+        self.max_workers = max_workers
+        self.tool_timeout = tool_timeout
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="swarm-tool"
+                )
+            return self._executor
+
+    def _call(self, func, args: dict, run: ToolRun):
+        run.start()
+        if CONTEXT_VARIABLES in func.__code__.co_varnames:
+            args[CONTEXT_VARIABLES] = run.context_variables
+        with accounting.timed("tool", func.__name__):
+            return func(**args)
+
+    def _result(self, future, run: ToolRun):
+        # A call queued behind busy workers for tool_timeout seconds counts as
+        # timed out too; once started it gets the full tool_timeout
+        if not run.started.wait(self.tool_timeout):
+            raise FutureTimeoutError()
+        remaining = run.started_at + self.tool_timeout - time.monotonic()
+        return future.result(timeout=max(remaining, 0))
+
+    def handle_tool_calls(self, tool_calls, functions, context_variables, debug):
+        if len(tool_calls) < 2:
+            return super().handle_tool_calls(
+                tool_calls, functions, context_variables, debug
+            )
+
+        function_map = {f.__name__: f for f in functions}
+        partial_response = Response(messages=[], agent=None, context_variables={})
+
+        pending = []
+        for tool_call in tool_calls:
+            name = tool_call.function.name
+            if name not in function_map:
+                debug_print(debug, f"Tool {name} not found in function map.")
+                pending.append((tool_call, None, None))
+                continue
+            args = json.loads(tool_call.function.arguments)
+            debug_print(debug, f"Processing tool call: {name} with arguments {args}")
+            run = ToolRun(context_variables)
+            # Run in a copy of this context so the tool sees the current
+            # trace span and usage thread
+            future = self.executor.submit(
+                contextvars.copy_context().run,
+                self._call,
+                function_map[name],
+                args,
+                run,
+            )
+            pending.append((tool_call, future, run))
+
+        for tool_call, future, run in pending:
+            name = tool_call.function.name
+            if future is None:
+                content = f"Error: Tool {name} not found."
+            else:
+                try:
+                    raw_result = self._result(future, run)
+                except FutureTimeoutError:
+                    future.cancel()
+                    content = f"Error: Tool {name} timed out after {self.tool_timeout}s."
+                    debug_print(debug, content)
+                except Exception as e:
+                    content = f"Error: Tool {name} failed: {e}"
+                    debug_print(debug, content)
+                else:
+                    # Context the tool changed in place, applied in call order
+                    run.apply(context_variables)
+                    result = self.handle_function_result(raw_result, debug)
+                    content = result.value
+                    partial_response.context_variables.update(result.context_variables)
+                    if result.agent:
+                        partial_response.agent = result.agent
+            partial_response.messages.append(
+                {
+                    "role": "tool",
+                    "tool_call_id": tool_call.id,
+                    "tool_name": name,
+                    "content": content,
+                }
+            )
+
+        return partial_response
+
 
-# Initialize Swarm client
-client = Swarm(client=azure_client)
+def swarm_client(client=None):
+    # Initialize Swarm client; SWARM_PARALLEL_TOOL_CALLS=false restores
+    # one-at-a-time tool execution
+    if os.getenv("SWARM_PARALLEL_TOOL_CALLS", "true").lower() == "false":
+        return PromptCachingSwarm(client=client or azure_client())
+    return ConcurrentSwarm(
+        client=client or azure_client(),
+        max_workers=int(os.getenv("SWARM_TOOL_WORKERS", "8")),
+        tool_timeout=float(os.getenv("SWARM_TOOL_TIMEOUT", "30")),
+    )
@@ -0,0 +1,94 @@
+from typing import List
+
+import tracing
+
+from search_cache import SearchCache, cache_key
+
+
+class QueryEmbedder:
+    """Embed query text with the ML Commons predict API, caching the vectors.
+
+    Repeated queries (and several searches fanned out from one question) reuse
+    the cached vector instead of running model inference again; misses from a
+    batch are embedded in one predict call.
+    """
+
+    def __init__(
+        self,
+        client,
+        model_id: str,
+        cache: SearchCache = None,
+        async_client=None,
+    ):
+        self.client = client
+        self.async_client = async_client
+        self.model_id = model_id
+        self.cache = cache
+
+    def embed(self, query: str) -> List[float]:
+        return self.embed_many([query])[0]
+
+    async def aembed(self, query: str) -> List[float]:
+        return (await self.aembed_many([query]))[0]
+
+    def embed_many(self, queries: List[str]) -> List[List[float]]:
+        with tracing.span("opensearch.embed", queries=len(queries)) as span:
+            vectors, missing = self._cached(queries)
+            span.set(cache_misses=len(missing))
+            if missing:
+                response = self.client.transport.perform_request(
+                    "POST",
+                    self._predict_path(),
+                    body=self._predict_body(queries, missing),
+                )
+                self._fill(queries, vectors, missing, response)
+            return vectors
+
+    async def aembed_many(self, queries: List[str]) -> List[List[float]]:
+        with tracing.span("opensearch.embed", queries=len(queries)) as span:
+            vectors, missing = self._cached(queries)
+            span.set(cache_misses=len(missing))
+            if missing:
+                if self.async_client is None:
+                    raise RuntimeError(
+                        "QueryEmbedder was created without an async_client"
+                    )
+                response = await self.async_client.transport.perform_request(
+                    "POST",
+                    self._predict_path(),
+                    body=self._predict_body(queries, missing),
+                )
+                self._fill(queries, vectors, missing, response)
+            return vectors
+
+    def _predict_path(self) -> str:
+        return f"/_plugins/_ml/_predict/text_embedding/{self.model_id}"
+
+    def _predict_body(self, queries: List[str], missing: List[int]) -> dict:
+        # Each distinct query is embedded once even if it repeats in a batch
+        texts = list(dict.fromkeys(queries[i] for i in missing))
+        return {
+            "text_docs": texts,
+            "return_number": True,
+            "target_response": ["sentence_embedding"],
+        }
+
+    def _cache_key(self, query: str) -> str:
+        return cache_key("embedding", query, model_id=self.model_id)
+
+    def _cached(self, queries: List[str]):
+        if self.cache is None:
+            return [None] * len(queries), list(range(len(queries)))
+        vectors = [self.cache.get(self._cache_key(query)) for query in queries]
+        return vectors, [i for i, vector in enumerate(vectors) if vector is None]
+
+    def _fill(self, queries, vectors, missing, response: dict) -> None:
+        texts = list(dict.fromkeys(queries[i] for i in missing))
+        by_text = {
+            text: result["output"][0]["data"]
+            for text, result in zip(texts, response["inference_results"])
+        }
+        for i in missing:
+            vectors[i] = by_text[queries[i]]
+            if self.cache is not None:
+                self.cache.set(self._cache_key(queries[i]), vectors[i])
@@ -0,0 +1,90 @@
+from typing import List, Sequence
+
+import numpy as np
+
+METHODS = ("weighted", "rrf")
+NORMALIZATIONS = ("l2", "min_max")
+
+
+def normalize(scores: np.ndarray, technique: str = "l2") -> np.ndarray:
+    """Scale one query's scores so they can be compared with another query's."""
+    if scores.size == 0:
+        return scores
+    if technique == "min_max":
+        low, high = scores.min(), scores.max()
+        if high == low:
+            return np.ones_like(scores)
+        return (scores - low) / (high - low)
+    norm = np.linalg.norm(scores)
+    return scores / norm if norm else scores
+
+
+class Fusion:
+    """Merge the ranked hits of the lexical and semantic legs of a hybrid search.
+
+    `weighted` normalizes each leg's scores (l2 or min_max) and takes their
+    weighted arithmetic mean, as the server-side normalization-processor does;
+    a document missing from a leg scores 0 there. `rrf` ignores scores and sums
+    weight / (rank_constant + rank) over the legs a document appears in.
+    """
+
+    def __init__(
+        self,
+        method: str = "weighted",
+        normalization: str = "l2",
+        weights: Sequence[float] = (0.25, 0.75),
+        rank_constant: int = 60,
+    ):
+        if method not in METHODS:
+            raise ValueError(f"Unknown fusion method {method!r}; use one of {METHODS}")
+        if normalization not in NORMALIZATIONS:
+            raise ValueError(
+                f"Unknown normalization {normalization!r}; use one of {NORMALIZATIONS}"
+            )
+        self.method = method
+        self.normalization = normalization
+        self.weights = tuple(float(weight) for weight in weights)
+        self.rank_constant = rank_constant
+
+    def fuse(self, legs: List[List[dict]], size: int, key: str = "id") -> List[dict]:
+        """Return the top `size` hits across legs, with the fused score as _score."""
+        if len(legs) != len(self.weights):
+            raise ValueError(f"Expected {len(self.weights)} legs, got {len(legs)}")
+
+        rows, hits = {}, []
+        for leg in legs:
+            for hit in leg:
+                if hit["_source"][key] not in rows:
+                    rows[hit["_source"][key]] = len(hits)
+                    hits.append(hit)
+        if not hits:
+            return []
+
+        weights = np.asarray(self.weights)
+        scores = np.zeros(len(hits))
+        for weight, leg in zip(weights, legs):
+            leg_rows = np.fromiter(
+                (rows[hit["_source"][key]] for hit in leg),
+                dtype=np.intp,
+                count=len(leg),
+            )
+            if self.method == "rrf":
+                ranks = np.arange(1, len(leg) + 1)
+                scores[leg_rows] += weight / (self.rank_constant + ranks)
+            else:
+                leg_scores = np.fromiter(
+                    (hit["_score"] for hit in leg), dtype=float, count=len(leg)
+                )
+                scores[leg_rows] += weight * normalize(leg_scores, self.normalization)
+        if self.method == "weighted":
+            scores /= weights.sum()
+
+        # Stable sort keeps the legs' order among equal scores
+        order = np.argsort(-scores, kind="stable")[:size]
+        return [dict(hits[i], _score=float(scores[i])) for i in order]
+
+    def __repr__(self) -> str:
+        return (
+            f"Fusion(method={self.method!r}, normalization={self.normalization!r}, "
+            f"weights={self.weights!r}, rank_constant={self.rank_constant!r})"
+        )
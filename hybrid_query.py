@@ -1,4 +1,4 @@
-from typing import Any
+from typing import Any, List
 
 
 def filter(query: dict):
@@ -13,11 +13,69 @@ def filter(query: dict):
     }
 
 
+def search_pipeline():
+    return {
+        "phase_results_processors": [
+            {
+                "normalization-processor": {
+                    "combination": {
+                        "parameters": {"weights": [0.25, 0.75]},
+                        "technique": "arithmetic_mean",
+                    },
+                    "normalization": {"technique": "l2"},
+                }
+            }
+        ]
+    }
+
+
+def lexical_query(query: str):
+    return filter(
+        {
+            "query_string": {
+                "default_operator": "OR",
+                "fields": [
+                    "title^1",
+                    "collection.title^5",
+                    "all_controlled_labels",
+                    "all_ids^1",
+                ],
+                "query": query,
+            }
+        }
+    )
+
+
+def semantic_query(
+    query: str,
+    model_id: str,
+    vector_field: str = "embedding",
+    k: int = 40,
+    vector: List[float] = None,
+):
+    # With a precomputed query vector the semantic leg is a plain knn query,
+    # so the cluster does not run model inference for it
+    if vector is None:
+        semantic = {
+            "neural": {
+                vector_field: {
+                    "k": k,
+                    "model_id": model_id,
+                    "query_text": query,
+                }
+            }
+        }
+    else:
+        semantic = {"knn": {vector_field: {"vector": vector, "k": k}}}
+    return filter(semantic)
+
+
 def hybrid_query(
     query: str,
     model_id: str,
     vector_field: str = "embedding",
     k: int = 40,
+    vector: List[float] = None,
     **kwargs: Any,
 ):
     result = {
@@ -25,47 +83,12 @@ def hybrid_query(
         "query": {
             "hybrid": {
                 "queries": [
-                    filter(
-                        {
-                            "query_string": {
-                                "default_operator": "OR",
-                                "fields": [
-                                    "title^1",
-                                    "collection.title^5",
-                                    "all_controlled_labels",
-                                    "all_ids^1",
-                                ],
-                                "query": query,
-                            }
-                        }
-                    ),
-                    filter(
-                        {
-                            "neural": {
-                                vector_field: {
-                                    "k": k,
-                                    "model_id": model_id,
-                                    "query_text": query,
-                                }
-                            }
-                        }
-                    ),
+                    lexical_query(query),
+                    semantic_query(query, model_id, vector_field, k, vector),
                 ]
             },
         },
-        "search_pipeline": {
-            "phase_results_processors": [
-                {
-                    "normalization-processor": {
-                        "combination": {
-                            "parameters": {"weights": [0.25, 0.75]},
-                            "technique": "arithmetic_mean",
-                        },
-                        "normalization": {"technique": "l2"},
-                    }
-                }
-            ]
-        },
+        "search_pipeline": search_pipeline(),
     }
 
     for key, value in kwargs.items():
@@ -1,19 +1,64 @@
+import accounting
 import os
+import time
+import tracing
 
 from typing import Literal
 
-from langgraph_agents.model import model
-from langgraph_agents.tools import search, aggregate
+from langgraph_agents.tools import (
+    search,
+    aggregate,
+    search_batch,
+    asearch_batch,
+    refresh_aggregate_description,
+    arefresh_aggregate_description,
+)
+from langgraph_agents.tool_node import BatchedToolNode
 from langgraph_agents.repl import repl
-from langgraph.checkpoint.memory import MemorySaver
+from langchain_core.messages import AIMessage, HumanMessage, message_chunk_to_message
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langgraph_agents.checkpointer import SqliteCheckpointSaver
 from langgraph.graph import END, START, StateGraph, MessagesState
 from langgraph.prebuilt import ToolNode
+from services import services
 
 tools = [search, aggregate]
 
-tool_node = ToolNode(tools)
+# Merge every `search` call the model emits in one turn into a single
+# _msearch request unless LANGGRAPH_BATCH_TOOL_CALLS is disabled
+if os.getenv("LANGGRAPH_BATCH_TOOL_CALLS", "true").lower() == "true":
+    tool_node = BatchedToolNode(
+        tools, batch_handlers={"search": ("query", search_batch, asearch_batch)}
+    )
+else:
+    tool_node = ToolNode(tools)
+
+
+# Bind the tools on first use so importing this module builds no clients; the
+# aggregate tool's field list is read from the index mapping at that point. A
+# model bound without the field list is not kept, so a later call retries once
+# the mapping's refresh interval has passed
+_model = None
+
+
+def model():
+    if _model is not None:
+        return _model
+    return _bind(refresh_aggregate_description())
+
+
+async def amodel():
+    if _model is not None:
+        return _model
+    return _bind(await arefresh_aggregate_description())
+
 
-model = model.bind_tools(tools)
+def _bind(loaded: bool):
+    global _model
+    bound = services.chat_model.bind_tools(tools)
+    if loaded:
+        _model = bound
+    return bound
 
 
 # Define the function that determines whether to continue or not
@@ -27,42 +72,166 @@ def should_continue(state: MessagesState) -> Literal["tools", END]:
     return END
 
 
-# Define the function that calls the model
-def call_model(state: MessagesState):
+# Define the function that calls the model. The response is streamed so
+# callers using stream_mode="messages" or astream_events see tokens as they
+# arrive; the chunks are merged back into a single message for the state.
+def call_model(state: MessagesState, config: RunnableConfig):
     messages = state["messages"]
-    response = model.invoke(messages, model=os.getenv("AZURE_DEPLOYMENT_NAME"))
+    response = None
+    start = time.perf_counter()
+    with tracing.span("call_model", messages=len(messages)) as span:
+        for chunk in model().stream(messages, model=os.getenv("AZURE_DEPLOYMENT_NAME")):
+            response = chunk if response is None else response + chunk
+        if response is None:
+            # Nothing to merge when the stream ends before its first chunk;
+            # ask once more without streaming
+            response = model().invoke(
+                messages, model=os.getenv("AZURE_DEPLOYMENT_NAME")
+            )
+        _trace_usage(span, response)
+    _account_usage(config, response, start)
     # We return a list, because this will get added to the existing list
-    return {"messages": [response]}
+    return {"messages": [message_chunk_to_message(response)]}
+
+
+async def acall_model(state: MessagesState, config: RunnableConfig):
+    messages = state["messages"]
+    response = None
+    start = time.perf_counter()
+    with tracing.span("call_model", messages=len(messages)) as span:
+        bound = await amodel()
+        async for chunk in bound.astream(
+            messages, model=os.getenv("AZURE_DEPLOYMENT_NAME")
+        ):
+            response = chunk if response is None else response + chunk
+        if response is None:
+            response = await bound.ainvoke(
+                messages, model=os.getenv("AZURE_DEPLOYMENT_NAME")
+            )
+        _trace_usage(span, response)
+    _account_usage(config, response, start)
+    return {"messages": [message_chunk_to_message(response)]}
+
+
+def _account_usage(config: RunnableConfig, response, start: float):
+    usage = (response.usage_metadata if response is not None else None) or {}
+    accounting.record(
+        "node",
+        "agent",
+        thread_id=config.get("configurable", {}).get("thread_id"),
+        prompt_tokens=usage.get("input_tokens"),
+        completion_tokens=usage.get("output_tokens"),
+        cached_tokens=(usage.get("input_token_details") or {}).get("cache_read"),
+        wall_ms=(time.perf_counter() - start) * 1000,
+    )
+
+
+def _trace_usage(span, response):
+    if not span.recording or response is None:
+        return
+    span.set(tool_calls=len(response.tool_calls))
+    if response.usage_metadata:
+        # The tools and history are sent first and in the same order every
+        # call, so all but the newest messages should be read from the
+        # provider's prompt cache
+        details = response.usage_metadata.get("input_token_details") or {}
+        span.set(
+            input_tokens=response.usage_metadata["input_tokens"],
+            output_tokens=response.usage_metadata["output_tokens"],
+            cached_tokens=details.get("cache_read", 0),
+        )
+
+
+# Paraphrases of an opening question that was already answered can be served
+# from the in-process semantic cache when LANGGRAPH_SEMANTIC_CACHE is enabled
+semantic_cache = os.getenv("LANGGRAPH_SEMANTIC_CACHE", "false").lower() == "true"
+
+
+def _opening_question(messages):
+    # Follow-up questions depend on earlier turns, so only a conversation's
+    # first question is looked up or stored
+    questions = [message for message in messages if isinstance(message, HumanMessage)]
+    return questions[0].content if len(questions) == 1 else None
+
+
+def check_cache(state: MessagesState):
+    question = _opening_question(state["messages"])
+    answer = services.semantic_cache.lookup(question) if question else None
+    return {"messages": [AIMessage(content=answer)] if answer else []}
+
+
+async def acheck_cache(state: MessagesState):
+    question = _opening_question(state["messages"])
+    answer = await services.semantic_cache.alookup(question) if question else None
+    return {"messages": [AIMessage(content=answer)] if answer else []}
+
+
+def store_answer(state: MessagesState):
+    question = _opening_question(state["messages"])
+    if question and state["messages"][-1].content:
+        services.semantic_cache.store(question, state["messages"][-1].content)
+    return {"messages": []}
+
+
+async def astore_answer(state: MessagesState):
+    question = _opening_question(state["messages"])
+    if question and state["messages"][-1].content:
+        await services.semantic_cache.astore(question, state["messages"][-1].content)
+    return {"messages": []}
+
+
+def cache_hit(state: MessagesState) -> Literal["agent", END]:
+    return END if isinstance(state["messages"][-1], AIMessage) else "agent"
 
 
 # Define a new graph
 workflow = StateGraph(MessagesState)
 
 # Define the two nodes we will cycle between
-workflow.add_node("agent", call_model)
+workflow.add_node("agent", RunnableLambda(call_model, afunc=acall_model))
 workflow.add_node("tools", tool_node)
 
-# Set the entrypoint as `agent`
-workflow.add_edge(START, "agent")
-
-# Add a conditional edge
-workflow.add_conditional_edges(
-    "agent",
-    should_continue,
-)
+if semantic_cache:
+    # Check the cache before the agent runs and store final answers after it
+    workflow.add_node("cache", RunnableLambda(check_cache, afunc=acheck_cache))
+    workflow.add_node("remember", RunnableLambda(store_answer, afunc=astore_answer))
+    workflow.add_edge(START, "cache")
+    workflow.add_conditional_edges("cache", cache_hit)
+    workflow.add_conditional_edges(
+        "agent", should_continue, {"tools": "tools", END: "remember"}
+    )
+    workflow.add_edge("remember", END)
+else:
+    # Set the entrypoint as `agent`
+    workflow.add_edge(START, "agent")
+
+    # Add a conditional edge
+    workflow.add_conditional_edges(
+        "agent",
+        should_continue,
+    )
 
 # Add a normal edge from `tools` to `agent`
 workflow.add_edge("tools", "agent")
 
-# Initialize memory to persist state between graph runs
-checkpointer = MemorySaver()
+# Persist state between graph runs (and restarts) on disk, keeping only the
+# most recent checkpoints of each conversation thread
+checkpointer = SqliteCheckpointSaver(
+    os.getenv("LANGGRAPH_CHECKPOINT_PATH", ".cache/checkpoints.sqlite"),
+    max_checkpoints_per_thread=int(os.getenv("LANGGRAPH_CHECKPOINTS_PER_THREAD", "20")),
+    max_threads=int(os.getenv("LANGGRAPH_MAX_THREADS", "1000")),
+)
 
 # Compile the graph
-app = workflow.compile(checkpointer=checkpointer, debug=True)
+app = workflow.compile(
+    checkpointer=checkpointer,
+    debug=os.getenv("LANGGRAPH_DEBUG", "false").lower() == "true",
+)
 
 
 def main():
-    repl(app)
+    services.prewarm()
+    repl(app, stream=os.getenv("LANGGRAPH_STREAM", "true").lower() == "true")
 
 
 if __name__ == "__main__":
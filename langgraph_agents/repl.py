@@ -1,5 +1,81 @@
-from langchain_core.messages import HumanMessage
-def repl(app):
+import accounting
+import json
+import os
+import time
+import uuid
+import tracing
+
+from langchain_core.messages import AIMessageChunk, HumanMessage
+
+
+def stream_response(app, user_input, config):
+    """Print LLM tokens and tool-call events while the graph runs.
+
+    Returns the time to first token in seconds, or None if the model never
+    produced any text.
+    """
+    start = time.perf_counter()
+    first_token_at = None
+    tool_started_at = {}
+    in_text = False
+
+    for mode, payload in app.stream(
+        {"messages": [HumanMessage(content=user_input)]},
+        config=config,
+        stream_mode=["messages", "updates"],
+    ):
+        if mode == "messages":
+            chunk, metadata = payload
+            if (
+                metadata.get("langgraph_node") != "agent"
+                or not isinstance(chunk, AIMessageChunk)
+                or not chunk.content
+            ):
+                continue
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            if not in_text:
+                print("\nAssistant: ", end="", flush=True)
+                in_text = True
+            print(chunk.content, end="", flush=True)
+            continue
+
+        for node, update in payload.items():
+            messages = (update or {}).get("messages", [])
+            if node == "agent":
+                for message in messages:
+                    for tool_call in getattr(message, "tool_calls", None) or []:
+                        tool_started_at[tool_call["id"]] = time.perf_counter()
+                        if in_text:
+                            print()
+                            in_text = False
+                        print(
+                            f"  → {tool_call['name']}({json.dumps(tool_call['args'])})",
+                            flush=True,
+                        )
+            elif node == "cache":
+                for message in messages:
+                    first_token_at = first_token_at or time.perf_counter()
+                    print(f"\nAssistant (cached): {message.content}", flush=True)
+            elif node == "tools":
+                for message in messages:
+                    started = tool_started_at.pop(message.tool_call_id, start)
+                    status = getattr(message, "status", "success")
+                    print(
+                        f"  ✓ {message.name} {status} in {time.perf_counter() - started:.2f}s",
+                        flush=True,
+                    )
+
+    total = time.perf_counter() - start
+    ttft = None if first_token_at is None else first_token_at - start
+    if ttft is not None:
+        tracing.current_span().set(ttft_ms=round(ttft * 1000, 3))
+    ttft_label = "n/a" if ttft is None else f"{ttft:.2f}s"
+    print(f"\n(time to first token: {ttft_label}, total: {total:.2f}s)")
+    return ttft
+
+
+def repl(app, stream=True):
     print("LangGraph AI Assistant 📈 (type 'exit' to quit)")
     print("-" * 50)
     print("""
@@ -8,31 +84,46 @@ def repl(app):
         - What is the most common creator variant?
         - How many works are there by work type?
         - What embedding models were used to generate the embeddings for the collections? How many works were generated with each model?
-    
+
     Or qualitative questions like:
         - Can you show me works about Willie Mays?
         - Which musicians played the Berkeley Folk Music Festival?
         - What kinds of food could you order on a transantlantic flight during the golden age of air travel?
     """)
-    
+
+    # Each session gets its own conversation thread; set LANGGRAPH_THREAD_ID to
+    # resume an earlier one from the checkpoint store
+    thread_id = os.getenv("LANGGRAPH_THREAD_ID") or uuid.uuid4().hex
+    print(f"Conversation thread: {thread_id}")
+    config = {"configurable": {"thread_id": thread_id}}
+
     while True:
         # Get user input
         user_input = input("\nUser: ").strip()
-        
+
         # Check for exit condition
         if user_input.lower() in ['exit', 'quit']:
             print("Goodbye!")
             break
-            
+
         # Skip empty inputs
         if not user_input:
             continue
-            
-        # Process the user's question
-        response = app.invoke(
-            {"messages": [HumanMessage(content=user_input)]},
-            config={"configurable": {"thread_id": 42}},
-        )
-        
+
+        with (
+            tracing.span("turn", thread_id=thread_id, input_length=len(user_input)),
+            accounting.thread_scope(thread_id),
+        ):
+            # Stream tokens and tool calls as they happen
+            if stream:
+                stream_response(app, user_input, config)
+                continue
+
+            # Process the user's question
+            response = app.invoke(
+                {"messages": [HumanMessage(content=user_input)]},
+                config=config,
+            )
+
         # Print the AI's response
-        print("\nAssistant:", response["messages"][-1].content)
\ No newline at end of file
+        print("\nAssistant:", response["messages"][-1].content)
@@ -0,0 +1,336 @@
+"""HTTP server for the LangGraph agent, streaming each turn as server-sent events.
+
+    uv run langgraph-server
+
+    POST /chat    {"message": "...", "thread_id": "optional"}
+                  streams `thread`, `token`, `tool_call`, `tool_result`,
+                  `message`, then `done` (or `error`) events
+    GET /health   {"status", "active_turns", "sessions"}
+
+Omitting thread_id starts a new conversation; its id is the first event and
+the X-Thread-Id header. Turns of different threads run concurrently on
+`astream`, at most LANGGRAPH_SERVER_CONCURRENCY at a time. Turns of one thread
+run in order, and a thread with LANGGRAPH_SESSION_QUEUE turns already waiting
+gets 429. On shutdown new turns get 503 and running ones are given
+LANGGRAPH_SHUTDOWN_TIMEOUT seconds to finish.
+"""
+
+import accounting
+import asyncio
+import json
+import os
+import tracing
+import uuid
+
+from services import services
+
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+
+MAX_BODY_BYTES = 64 * 1024
+MAX_THREAD_ID_LENGTH = 128
+
+
+class Session:
+    """Turns of one conversation thread: one runs at a time, the rest wait."""
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.pending = 0
+
+
+class AgentServer:
+    """ASGI app running turns of a compiled LangGraph graph."""
+
+    def __init__(
+        self,
+        graph,
+        max_concurrency: int = 32,
+        session_queue: int = 4,
+        event_buffer: int = 64,
+        shutdown_timeout: float = 30,
+    ):
+        self.graph = graph
+        self.max_concurrency = max_concurrency
+        self.session_queue = session_queue
+        self.event_buffer = event_buffer
+        self.shutdown_timeout = shutdown_timeout
+        self.sessions = {}
+        self.turns = set()
+        self.closing = False
+        self._semaphore = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            route = (scope["method"], scope["path"])
+            if route == ("GET", "/health"):
+                await _send_json(send, 200, self.health())
+            elif route == ("POST", "/chat"):
+                await self._chat(receive, send)
+            else:
+                await _send_json(send, 404, {"error": "Not found"})
+
+    def health(self) -> dict:
+        return {
+            "status": "closing" if self.closing else "ok",
+            "active_turns": len(self.turns),
+            "sessions": len(self.sessions),
+        }
+
+    async def shutdown(self) -> None:
+        """Refuse new turns, wait for running ones, then cancel the stragglers."""
+        self.closing = True
+        if self.turns:
+            _, pending = await asyncio.wait(
+                set(self.turns), timeout=self.shutdown_timeout
+            )
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        accounting.ledger.flush()
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                # Building the clients blocks, so keep it off the event loop
+                await asyncio.get_running_loop().run_in_executor(None, services.prewarm)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _chat(self, receive, send):
+        if self.closing:
+            await _send_json(send, 503, {"error": "Server is shutting down"})
+            return
+        try:
+            request = json.loads(await _read_body(receive))
+            message = request["message"]
+            thread_id = str(request.get("thread_id") or uuid.uuid4().hex)
+        except (ValueError, KeyError, TypeError) as e:
+            await _send_json(send, 400, {"error": f"Invalid request: {e}"})
+            return
+        if not isinstance(message, str) or not message.strip():
+            await _send_json(send, 400, {"error": "message must be a non-empty string"})
+            return
+        if len(thread_id) > MAX_THREAD_ID_LENGTH:
+            await _send_json(send, 400, {"error": "thread_id is too long"})
+            return
+
+        session = self.sessions.setdefault(thread_id, Session())
+        if session.pending >= self.session_queue:
+            await _send_json(
+                send, 429, {"error": f"Too many pending turns for thread {thread_id}"}
+            )
+            return
+        session.pending += 1
+        try:
+            await self._stream_turn(receive, send, thread_id, message, session)
+        finally:
+            session.pending -= 1
+            if session.pending == 0:
+                self.sessions.pop(thread_id, None)
+
+    async def _stream_turn(self, receive, send, thread_id, message, session):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/event-stream"),
+                    (b"cache-control", b"no-cache"),
+                    (b"x-thread-id", thread_id.encode()),
+                ],
+            }
+        )
+        await _send_event(send, "thread", {"thread_id": thread_id})
+
+        # A bounded queue between the graph and the socket: a slow client
+        # pauses its own turn instead of buffering events without limit
+        events = asyncio.Queue(self.event_buffer)
+        turn = asyncio.create_task(self._run_turn(thread_id, message, session, events))
+        self.turns.add(turn)
+        turn.add_done_callback(self.turns.discard)
+        disconnected = asyncio.create_task(_wait_for_disconnect(receive))
+        next_event = None
+        try:
+            while True:
+                next_event = asyncio.create_task(events.get())
+                await asyncio.wait(
+                    {next_event, disconnected}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not next_event.done():
+                    # The client went away; the turn is stopped below
+                    return
+                event = next_event.result()
+                if event is None:
+                    break
+                await _send_event(send, *event)
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            disconnected.cancel()
+            if next_event is not None:
+                next_event.cancel()
+            if not turn.done():
+                # Reached on a disconnect and when this handler is cancelled;
+                # wait for the turn to unwind so the session (and its lock)
+                # outlives it
+                turn.cancel()
+                await asyncio.gather(turn, return_exceptions=True)
+
+    async def _run_turn(self, thread_id, message, session, events):
+        finished = False
+        try:
+            async with session.lock, self.semaphore:
+                with (
+                    tracing.span(
+                        "turn", thread_id=thread_id, input_length=len(message)
+                    ),
+                    accounting.thread_scope(thread_id),
+                ):
+                    stream = self.graph.astream(
+                        {"messages": [HumanMessage(content=message)]},
+                        config={"configurable": {"thread_id": thread_id}},
+                        stream_mode=["messages", "updates"],
+                    )
+                    try:
+                        async for mode, payload in stream:
+                            for event in _events(mode, payload):
+                                await events.put(event)
+                    finally:
+                        # Closes the graph's own tasks when the turn is cancelled
+                        await stream.aclose()
+            await events.put(("done", {}))
+            await events.put(None)
+            finished = True
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Turn failed for thread {thread_id}: {e!r}")
+            await events.put(("error", {"error": str(e)}))
+            await events.put(None)
+            finished = True
+        finally:
+            if not finished:
+                # Cancelled: end the stream without waiting on the reader
+                _end_stream(events, ("error", {"error": "turn cancelled"}))
+
+
+def _end_stream(events, event) -> None:
+    """Queue event and the end of the stream, dropping the oldest events if full."""
+    for item in (event, None):
+        while True:
+            try:
+                events.put_nowait(item)
+                break
+            except asyncio.QueueFull:
+                events.get_nowait()
+
+
+def _events(mode, payload):
+    """Translate one astream item into (event, data) pairs."""
+    if mode == "messages":
+        chunk, metadata = payload
+        if (
+            metadata.get("langgraph_node") == "agent"
+            and isinstance(chunk, AIMessageChunk)
+            and chunk.content
+        ):
+            yield "token", {"content": chunk.content}
+        return
+
+    for node, update in payload.items():
+        for message in (update or {}).get("messages", []):
+            if node == "tools":
+                yield "tool_result", {
+                    "id": message.tool_call_id,
+                    "name": message.name,
+                    "status": getattr(message, "status", "success"),
+                }
+            elif isinstance(message, AIMessage) and message.tool_calls:
+                for tool_call in message.tool_calls:
+                    yield "tool_call", {
+                        "id": tool_call["id"],
+                        "name": tool_call["name"],
+                        "args": tool_call["args"],
+                    }
+            elif isinstance(message, AIMessage):
+                yield "message", {"content": message.content, "cached": node == "cache"}
+
+
+async def _read_body(receive) -> bytes:
+    body = b""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise ValueError("client disconnected")
+        body += message.get("body", b"")
+        if len(body) > MAX_BODY_BYTES:
+            raise ValueError("request body too large")
+        if not message.get("more_body"):
+            return body
+
+
+async def _wait_for_disconnect(receive) -> None:
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _send_event(send, event: str, data: dict) -> None:
+    payload = f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+    await send(
+        {"type": "http.response.body", "body": payload.encode(), "more_body": True}
+    )
+
+
+async def _send_json(send, status: int, data: dict) -> None:
+    body = json.dumps(data).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+def create_server(graph=None) -> AgentServer:
+    if graph is None:
+        from langgraph_agents.main import app as graph
+
+    return AgentServer(
+        graph,
+        max_concurrency=int(os.getenv("LANGGRAPH_SERVER_CONCURRENCY", "32")),
+        session_queue=int(os.getenv("LANGGRAPH_SESSION_QUEUE", "4")),
+        shutdown_timeout=float(os.getenv("LANGGRAPH_SHUTDOWN_TIMEOUT", "30")),
+    )
+
+
+def main():
+    import uvicorn
+
+    uvicorn.run(
+        create_server(),
+        host=os.getenv("LANGGRAPH_SERVER_HOST", "127.0.0.1"),
+        port=int(os.getenv("LANGGRAPH_SERVER_PORT", "8000")),
+        lifespan="on",
+        # Open streams get this long to finish before the app's own shutdown
+        timeout_graceful_shutdown=int(os.getenv("LANGGRAPH_SHUTDOWN_TIMEOUT", "30")),
+    )
+
+
+if __name__ == "__main__":
+    main()
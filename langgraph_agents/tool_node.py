@@ -0,0 +1,140 @@
+import asyncio
+import tracing
+
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from langchain_core.messages import ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import get_config_list, get_executor_for_config
+from langgraph.prebuilt import ToolNode
+from langgraph.prebuilt.tool_node import TOOL_CALL_ERROR_TEMPLATE
+
+BatchHandler = Tuple[
+    str,
+    Callable[[List[Any]], List[str]],
+    Callable[[List[Any]], Awaitable[List[str]]],
+]
+
+
+class BatchedToolNode(ToolNode):
+    """ToolNode that merges every pending call to a batchable tool into one request.
+
+    `batch_handlers` maps a tool name to `(argument, func, afunc)`: the tool
+    argument collected from each call, and sync/async functions that take the
+    list of collected arguments and return one result string per call. Calls
+    to other tools run exactly as they would in a plain ToolNode.
+    """
+
+    def __init__(self, tools, batch_handlers: Dict[str, BatchHandler], **kwargs: Any):
+        super().__init__(tools, **kwargs)
+        self.batch_handlers = batch_handlers
+
+    def _func(self, input, config: RunnableConfig, *, store) -> Any:
+        tool_calls, output_type = self._parse_input(input, store)
+        with tracing.span("tool_node", tool_calls=len(tool_calls)) as span:
+            outputs = self._run_calls(tool_calls, config, span)
+        return self._ordered_output(tool_calls, outputs, output_type)
+
+    def _run_calls(
+        self, tool_calls, config: RunnableConfig, span
+    ) -> Dict[str, ToolMessage]:
+        batches, singles = self._partition(tool_calls)
+        span.set(batched=sum(len(calls) for calls in batches.values()))
+
+        outputs: Dict[str, ToolMessage] = {}
+        config_list = get_config_list(config, len(singles))
+        with get_executor_for_config(config) as executor:
+            # Batches run on the executor alongside the other calls, as the
+            # async path gathers them
+            batch_futures = [
+                executor.submit(self._run_batch, name, calls)
+                for name, calls in batches.items()
+            ]
+            for call, message in zip(
+                singles, executor.map(self._run_one, singles, config_list)
+            ):
+                outputs[call["id"]] = message
+            for future in batch_futures:
+                outputs.update(future.result())
+        return outputs
+
+    def _run_batch(self, name, calls) -> Dict[str, ToolMessage]:
+        argument, func, _ = self.batch_handlers[name]
+        try:
+            results = func([call["args"][argument] for call in calls])
+        except Exception as e:
+            results = e
+        return self._batch_messages(calls, results)
+
+    async def _afunc(self, input, config: RunnableConfig, *, store) -> Any:
+        tool_calls, output_type = self._parse_input(input, store)
+        with tracing.span("tool_node", tool_calls=len(tool_calls)) as span:
+            outputs = await self._arun_calls(tool_calls, config, span)
+        return self._ordered_output(tool_calls, outputs, output_type)
+
+    async def _arun_calls(
+        self, tool_calls, config: RunnableConfig, span
+    ) -> Dict[str, ToolMessage]:
+        batches, singles = self._partition(tool_calls)
+        span.set(batched=sum(len(calls) for calls in batches.values()))
+
+        async def run_batch(name, calls):
+            argument, _, afunc = self.batch_handlers[name]
+            try:
+                results = await afunc([call["args"][argument] for call in calls])
+            except Exception as e:
+                results = e
+            return self._batch_messages(calls, results)
+
+        batch_outputs, single_outputs = await asyncio.gather(
+            asyncio.gather(*(run_batch(name, calls) for name, calls in batches.items())),
+            asyncio.gather(*(self._arun_one(call, config) for call in singles)),
+        )
+
+        outputs: Dict[str, ToolMessage] = {}
+        for messages in batch_outputs:
+            outputs.update(messages)
+        for call, message in zip(singles, single_outputs):
+            outputs[call["id"]] = message
+        return outputs
+
+    def _partition(self, tool_calls):
+        batches: Dict[str, list] = {}
+        singles = []
+        for call in tool_calls:
+            handler = self.batch_handlers.get(call["name"])
+            if (
+                handler is None
+                or self._validate_tool_call(call)
+                or handler[0] not in call["args"]
+            ):
+                singles.append(call)
+            else:
+                batches.setdefault(call["name"], []).append(call)
+        return batches, singles
+
+    def _batch_messages(self, calls, results) -> Dict[str, ToolMessage]:
+        if isinstance(results, Exception):
+            if not self.handle_tool_errors:
+                raise results
+            content = TOOL_CALL_ERROR_TEMPLATE.format(error=repr(results))
+            return {
+                call["id"]: ToolMessage(
+                    content=content,
+                    name=call["name"],
+                    tool_call_id=call["id"],
+                    status="error",
+                )
+                for call in calls
+            }
+
+        return {
+            call["id"]: ToolMessage(
+                content=result, name=call["name"], tool_call_id=call["id"]
+            )
+            for call, result in zip(calls, results)
+        }
+
+    def _ordered_output(self, tool_calls, outputs, output_type):
+        messages = [outputs[call["id"]] for call in tool_calls]
+        return messages if output_type == "list" else {self.messages_key: messages}
@@ -1,37 +1,193 @@
+import accounting
+import asyncio
 import json
+import textwrap
+import tracing
 
-from langchain_core.tools import tool
-from opensearch_client import opensearch_vector_store
+from langchain_core.runnables.config import var_child_runnable_config
+from langchain_core.tools import StructuredTool
+from search_results import compact_results
+from services import services
+from tokens import count_tokens
 
 
-@tool
-def search(query: str):
+def _traced_result(span, content: str) -> str:
+    if span.recording:
+        span.set(result_tokens=count_tokens(content))
+    return content
+
+
+def _thread_id():
+    # The conversation thread of the graph run this tool call belongs to
+    config = var_child_runnable_config.get() or {}
+    return config.get("configurable", {}).get("thread_id")
+
+
+def _search(query: str):
     """Perform a semantic search of Northwestern University Library digital collections. When answering a search query, ground your answer in the context of the results with references to the document's metadata."""
-    query_results = opensearch_vector_store.similarity_search(query, size=20)
-    return json.dumps(query_results, default=str)
+    with (
+        tracing.span("tool.search", query_length=len(query)) as span,
+        accounting.timed("tool", "search", _thread_id()),
+    ):
+        query_results = services.opensearch_vector_store.similarity_search_with_score(query, size=20)
+        return _traced_result(span, compact_results(query_results))
 
 
-@tool
-def aggregate(aggregation_query: str):
-    """
+async def _asearch(query: str):
+    with (
+        tracing.span("tool.search", query_length=len(query)) as span,
+        accounting.timed("tool", "search", _thread_id()),
+    ):
+        query_results = await services.opensearch_vector_store.asimilarity_search_with_score(query, size=20)
+        return _traced_result(span, compact_results(query_results))
+
+
+def search_batch(queries: list[str]) -> list[str]:
+    """Run several search tool calls as one _msearch request."""
+    with (
+        tracing.span("tool.search_batch", queries=len(queries)) as span,
+        accounting.timed("tool", "search_batch", _thread_id()),
+    ):
+        results = services.opensearch_vector_store.similarity_search_batch_with_score(queries, size=20)
+        contents = [compact_results(query_results) for query_results in results]
+        _traced_result(span, "".join(contents))
+        return contents
+
+
+async def asearch_batch(queries: list[str]) -> list[str]:
+    with (
+        tracing.span("tool.search_batch", queries=len(queries)) as span,
+        accounting.timed("tool", "search_batch", _thread_id()),
+    ):
+        results = await services.opensearch_vector_store.asimilarity_search_batch_with_score(queries, size=20)
+        contents = [compact_results(query_results) for query_results in results]
+        _traced_result(span, "".join(contents))
+        return contents
+
+
+def _fields(aggregation_query: str) -> list[str]:
+    return [field.strip() for field in aggregation_query.split(",") if field.strip()]
+
+
+AGGREGATE_DESCRIPTION = """
     Perform a quantitative aggregation on the OpenSearch index.
 
     Available fields:
-    api_link, api_model, ark, collection.title.keyword, contributor.label.keyword, contributor.variants, 
-    create_date, creator.variants, date_created, embedding_model, embedding_text_length,
-    folder_name, folder_number, genre.variants, id, identifier, indexed_at, language.variants, 
-    legacy_identifier, library_unit, location.variants, modified_date, notes.note, notes.type,
-    physical_description_material, physical_description_size, preservation_level, provenance, published, publisher, 
-    related_url.url, related_url.label, representative_file_set.aspect_ratio, representative_file_set.url, rights_holder,
-    series, status, style_period.label.keyword, style_period.variants, subject.label.keyword, subject.role, 
-    subject.variants, table_of_contents, technique.label.keyword, technique.variants, title.keyword, visibility, work_type
+    {fields}
+
+    Text fields can be given with or without their .keyword suffix.
+
+    The result lists the 10 most common values with their counts. Set
+    distinct_count to true to also get distinct_count.value, the number of
+    different values of the field (approximate; near-exact below ~40,000).
+
+    To aggregate several fields at once, pass them comma-separated; the result
+    then has each field's aggregation under "results" and any failed field
+    under "errors".
 
     Examples:
         - Number of collections: collection.title.keyword
         - Number of works by work type: work_type
+        - Work types and genres: work_type,genre.variants
     """
+
+
+def aggregatable_fields():
+    """Aggregatable fields from the index mapping, or None if it can't be loaded."""
     try:
-        response = opensearch_vector_store.aggregations_search(aggregation_query)
-        return json.dumps(response, default=str)
+        mappings = services.opensearch_vector_store.mappings
+        return mappings.aggregatable_fields() if mappings else []
     except Exception as e:
-        return json.dumps({"error": str(e)})
+        print(f"Could not load the index mapping for the aggregate tool: {e}")
+        return None
+
+
+async def aaggregatable_fields():
+    try:
+        # The first read builds the clients, which blocks
+        store = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: services.opensearch_vector_store
+        )
+        mappings = store.mappings
+        return await mappings.aaggregatable_fields() if mappings else []
+    except Exception as e:
+        print(f"Could not load the index mapping for the aggregate tool: {e}")
+        return None
+
+
+def aggregate_description(fields: list[str] = None) -> str:
+    """Describe the aggregate tool, listing fields from the index mapping."""
+    if fields is None:
+        fields = aggregatable_fields() or []
+    return textwrap.dedent(AGGREGATE_DESCRIPTION).strip().format(
+        fields=", ".join(fields) or "(index mapping unavailable)"
+    )
+
+
+def _aggregate(aggregation_query: str, distinct_count: bool = False):
+    with (
+        tracing.span("tool.aggregate", field=aggregation_query) as span,
+        accounting.timed("tool", "aggregate", _thread_id()),
+    ):
+        try:
+            fields = _fields(aggregation_query)
+            if len(fields) > 1:
+                response = services.opensearch_vector_store.aggregations_search_many(
+                    fields, distinct_count=distinct_count
+                )
+            else:
+                response = services.opensearch_vector_store.aggregations_search(
+                    aggregation_query, distinct_count=distinct_count
+                )
+            return _traced_result(span, json.dumps(response, default=str))
+        except Exception as e:
+            span.set(error=repr(e))
+            return json.dumps({"error": str(e)})
+
+
+async def _aaggregate(aggregation_query: str, distinct_count: bool = False):
+    with (
+        tracing.span("tool.aggregate", field=aggregation_query) as span,
+        accounting.timed("tool", "aggregate", _thread_id()),
+    ):
+        try:
+            fields = _fields(aggregation_query)
+            if len(fields) > 1:
+                response = await services.opensearch_vector_store.aaggregations_search_many(
+                    fields, distinct_count=distinct_count
+                )
+            else:
+                response = await services.opensearch_vector_store.aaggregations_search(
+                    aggregation_query, distinct_count=distinct_count
+                )
+            return _traced_result(span, json.dumps(response, default=str))
+        except Exception as e:
+            span.set(error=repr(e))
+            return json.dumps({"error": str(e)})
+
+
+# Each tool carries a blocking and a native async implementation so the graph
+# can be driven with either invoke/stream or ainvoke/astream.
+search = StructuredTool.from_function(func=_search, coroutine=_asearch, name="search")
+
+# The field list comes from the index mapping, so it is filled in by
+# refresh_aggregate_description() when the model is first bound rather than
+# at import time
+aggregate = StructuredTool.from_function(
+    func=_aggregate,
+    coroutine=_aaggregate,
+    name="aggregate",
+    description=aggregate_description(fields=[]),
+)
+
+
+def refresh_aggregate_description(fields: list[str] = None) -> bool:
+    """Fill in the aggregate tool's field list; False if the mapping failed to load."""
+    if fields is None:
+        fields = aggregatable_fields()
+    aggregate.description = aggregate_description(fields or [])
+    return fields is not None
+
+
+async def arefresh_aggregate_description() -> bool:
+    return refresh_aggregate_description(await aaggregatable_fields())
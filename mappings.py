@@ -0,0 +1,180 @@
+import difflib
+import threading
+import time
+
+from typing import Dict, List
+
+AGGREGATABLE_TYPES = {
+    "boolean",
+    "byte",
+    "constant_keyword",
+    "date",
+    "date_nanos",
+    "double",
+    "float",
+    "half_float",
+    "integer",
+    "ip",
+    "keyword",
+    "long",
+    "scaled_float",
+    "short",
+    "unsigned_long",
+    "version",
+}
+
+
+class MappingRegistry:
+    """Field types of an index, loaded once from `_mapping` and cached.
+
+    Used to check aggregation fields before a request is sent: text fields
+    resolve to their `.keyword` subfield, and unknown fields are rejected with
+    suggestions. An unknown field triggers at most one reload per
+    `refresh_interval` seconds, in case the mapping changed, and a mapping
+    that failed to load is not requested again within that interval either.
+    """
+
+    def __init__(self, client, index: str, async_client=None, refresh_interval=60):
+        self.client = client
+        self.async_client = async_client
+        self.index = index
+        self.refresh_interval = refresh_interval
+        self._fields = None
+        self._loaded_at = 0.0
+        self._failed_at = None
+        self._error = None
+        self._lock = threading.Lock()
+
+    def fields(self) -> Dict[str, str]:
+        """Map every field path (including multi-fields) to its type."""
+        if self._fields is None:
+            self._check_failed()
+            self.refresh()
+        return self._fields
+
+    async def afields(self) -> Dict[str, str]:
+        if self._fields is None:
+            self._check_failed()
+            await self.arefresh()
+        return self._fields
+
+    def refresh(self) -> Dict[str, str]:
+        try:
+            response = self.client.indices.get_mapping(index=self.index)
+        except Exception as e:
+            self._failed(e)
+            raise
+        self._update(response)
+        return self._fields
+
+    async def arefresh(self) -> Dict[str, str]:
+        if self.async_client is None:
+            return self.refresh()
+        try:
+            response = await self.async_client.indices.get_mapping(index=self.index)
+        except Exception as e:
+            self._failed(e)
+            raise
+        self._update(response)
+        return self._fields
+
+    async def aaggregatable_fields(self) -> List[str]:
+        return sorted(
+            field
+            for field, field_type in (await self.afields()).items()
+            if field_type in AGGREGATABLE_TYPES
+        )
+
+    def aggregatable_fields(self) -> List[str]:
+        return sorted(
+            field
+            for field, field_type in self.fields().items()
+            if field_type in AGGREGATABLE_TYPES
+        )
+
+    def resolve(self, field: str) -> str:
+        """Return the aggregatable field for `field`, or raise ValueError."""
+        resolved = self._resolve(self.fields(), field)
+        if resolved is None and self._may_refresh():
+            resolved = self._resolve(self.refresh(), field)
+        if resolved is None:
+            raise ValueError(self._unknown(field))
+        return resolved
+
+    async def aresolve(self, field: str) -> str:
+        resolved = self._resolve(await self.afields(), field)
+        if resolved is None and self._may_refresh():
+            resolved = self._resolve(await self.arefresh(), field)
+        if resolved is None:
+            raise ValueError(self._unknown(field))
+        return resolved
+
+    def _resolve(self, fields: Dict[str, str], field: str):
+        if fields.get(field) in AGGREGATABLE_TYPES:
+            return field
+        if fields.get(f"{field}.keyword") in AGGREGATABLE_TYPES:
+            return f"{field}.keyword"
+        return None
+
+    def _check_failed(self) -> None:
+        # Within refresh_interval of a failed load, fail fast instead of
+        # sending (and waiting on) another request
+        if (
+            self._failed_at is not None
+            and time.monotonic() - self._failed_at < self.refresh_interval
+        ):
+            raise RuntimeError(
+                f"Mapping of {self.index} could not be loaded: {self._error}"
+            ) from self._error
+
+    def _failed(self, error: Exception) -> None:
+        with self._lock:
+            self._failed_at = time.monotonic()
+            self._error = error
+
+    def _may_refresh(self) -> bool:
+        return time.monotonic() - self._loaded_at >= self.refresh_interval
+
+    def _unknown(self, field: str) -> str:
+        fields = self.aggregatable_fields()
+        reason = (
+            f"{field} cannot be aggregated"
+            if field in self._fields
+            else f"{field} is not a field of {self.index}"
+        )
+        # Match against names without .keyword too, since that is how a
+        # misspelt text field usually arrives
+        names = {name.removesuffix(".keyword"): name for name in fields}
+        suggestions = difflib.get_close_matches(field, names, n=3, cutoff=0.6)
+        if suggestions:
+            suggested = ", ".join(names[name] for name in suggestions)
+            reason += f"; did you mean {suggested}?"
+        return reason
+
+    def _update(self, response: dict) -> None:
+        fields = {}
+        # An alias may point at several indices; their mappings are merged
+        for mapping in response.values():
+            _flatten(mapping.get("mappings", {}).get("properties", {}), "", fields)
+        with self._lock:
+            self._fields = fields
+            self._loaded_at = time.monotonic()
+            self._failed_at = self._error = None
+
+
+def _flatten(properties: dict, prefix: str, fields: dict, nested=False) -> None:
+    for name, spec in properties.items():
+        path = f"{prefix}{name}"
+        field_type = spec.get("type", "object")
+        # Fields under a nested object need a nested aggregation; treat them
+        # as not aggregatable here
+        fields[path] = "nested" if nested and field_type != "object" else field_type
+        for subname, subspec in spec.get("fields", {}).items():
+            fields[f"{path}.{subname}"] = "nested" if nested else subspec.get("type")
+        if "properties" in spec:
+            _flatten(
+                spec["properties"],
+                f"{path}.",
+                fields,
+                nested=nested or field_type == "nested",
+            )
@@ -1,12 +1,33 @@
 import os
+import threading
 import boto3
+import tracing
 
 from dotenv import load_dotenv
+from functools import cache
+from embeddings import QueryEmbedder
+from fusion import Fusion
+from mappings import MappingRegistry
 from opensearch_neural_search import OpenSearchNeuralSearch
-from opensearchpy import OpenSearch, RequestsHttpConnection
+from search_cache import MemoryCacheBackend, SearchCache, SQLiteCacheBackend
+from semantic_cache import SemanticCache
+from opensearchpy import (
+    AsyncHttpConnection,
+    AsyncOpenSearch,
+    AWSV4SignerAsyncAuth,
+    JSONSerializer,
+    OpenSearch,
+    RequestsHttpConnection,
+)
+from opensearchpy.exceptions import SerializationError
 from requests_aws4auth import AWS4Auth
 from urllib.parse import urlparse
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 load_dotenv()
 
 
@@ -25,54 +46,277 @@ def opensearch_endpoint():
         return endpoint
 
 
-def opensearch_client(region_name=os.getenv("AWS_REGION", "us-east-1")):
+def pool_size():
+    return int(os.getenv("OPENSEARCH_POOL_SIZE", "25"))
+
+
+def http_compress():
+    return os.getenv("OPENSEARCH_HTTP_COMPRESS", "false").lower() == "true"
+
+
+class OrjsonSerializer(JSONSerializer):
+    """JSONSerializer backed by orjson, for request bodies and responses."""
+
+    def loads(self, s):
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError as e:
+            raise SerializationError(s, e)
+
+    def dumps(self, data):
+        if isinstance(data, str):
+            return data
+        # Return str, not bytes: _msearch joins the serialized lines itself
+        try:
+            return orjson.dumps(
+                data,
+                default=self.default,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+            ).decode()
+        except TypeError as e:
+            raise SerializationError(data, e)
+
+
+def serializer():
+    # orjson when installed, unless OPENSEARCH_SERIALIZER=json
+    if orjson is not None and os.getenv("OPENSEARCH_SERIALIZER", "orjson") == "orjson":
+        return OrjsonSerializer()
+    return JSONSerializer()
+
+
+@cache
+def aws_credentials(region_name=os.getenv("AWS_REGION", "us-east-1")):
+    # One boto3 session per process; its refreshable credentials are reused for
+    # signing until they expire instead of being resolved for every client
     session = boto3.Session(region_name=region_name)
     print(f"Session: {session}")
+    return session.get_credentials()
+
+
+class PooledRequestsHttpConnection(RequestsHttpConnection):
+    """RequestsHttpConnection that records how busy its connection pool is."""
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool_maxsize = kwargs.get("pool_maxsize") or 10
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.saturated_requests = 0
+        self._lock = threading.Lock()
+
+    def perform_request(self, *args, **kwargs):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            if self.in_flight > self.pool_maxsize:
+                self.saturated_requests += 1
+        # Every attempt of a retried request passes through here
+        tracing.current_span().incr("http_attempts")
+        try:
+            return super().perform_request(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def pool_metrics(self):
+        pools = []
+        for adapter in {id(a): a for a in self.session.adapters.values()}.values():
+            manager = adapter.poolmanager
+            pools.extend(manager.pools[key] for key in manager.pools.keys())
+
+        return {
+            "pool_maxsize": self.pool_maxsize,
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "saturated_requests": self.saturated_requests,
+            "connections_opened": sum(pool.num_connections for pool in pools),
+            "idle_connections": sum(
+                sum(1 for conn in list(pool.pool.queue) if conn)
+                for pool in pools
+                if pool.pool is not None
+            ),
+        }
+
+
+def transport_metrics(client):
+    """Connection pool utilization for a client built by this module."""
+    metrics = []
+    for connection in client.transport.connection_pool.connections:
+        if isinstance(connection, PooledRequestsHttpConnection):
+            metrics.append(connection.pool_metrics())
+        elif isinstance(connection, AsyncHttpConnection):
+            connector = connection.session.connector if connection.session else None
+            metrics.append(
+                {
+                    "pool_maxsize": connection._limit,
+                    "in_flight": len(connector._acquired) if connector else 0,
+                }
+            )
+    return metrics
+
+
+def opensearch_client(region_name=os.getenv("AWS_REGION", "us-east-1")):
     awsauth = AWS4Auth(
         region=region_name,
         service="es",
-        refreshable_credentials=session.get_credentials(),
+        refreshable_credentials=aws_credentials(region_name),
     )
 
     return OpenSearch(
         hosts=[{"host": opensearch_endpoint(), "port": 443}],
         use_ssl=True,
-        connection_class=RequestsHttpConnection,
+        connection_class=PooledRequestsHttpConnection,
         http_auth=awsauth,
+        pool_maxsize=pool_size(),
+        http_compress=http_compress(),
+        headers={"connection": "keep-alive"},
+        serializer=serializer(),
+    )
+
+
+def opensearch_async_client(region_name=os.getenv("AWS_REGION", "us-east-1")):
+    return AsyncOpenSearch(
+        hosts=[{"host": opensearch_endpoint(), "port": 443}],
+        use_ssl=True,
+        connection_class=AsyncHttpConnection,
+        http_auth=AWSV4SignerAsyncAuth(aws_credentials(region_name), region_name, "es"),
+        maxsize=pool_size(),
+        http_compress=http_compress(),
+        serializer=serializer(),
+    )
+
+
+def search_cache(backend=os.getenv("SEARCH_CACHE", "off"), table="search", ttl=None):
+    if backend == "off":
+        return None
+
+    max_size = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+    if backend == "sqlite":
+        store = SQLiteCacheBackend(
+            os.getenv("SEARCH_CACHE_PATH", ".cache/search.sqlite"),
+            table=table,
+            max_size=max_size,
+        )
+    else:
+        store = MemoryCacheBackend(max_size=max_size)
+
+    return SearchCache(store, ttl=ttl or float(os.getenv("SEARCH_CACHE_TTL", "300")))
+
+
+def semantic_cache(vector_store: OpenSearchNeuralSearch):
+    # Reuse the knn embedder (and its vector cache) when there is one
+    embedder = vector_store.embedder or QueryEmbedder(
+        vector_store.client,
+        vector_store.model_id,
+        cache=search_cache(
+            backend="memory",
+            table="embeddings",
+            ttl=float(os.getenv("EMBEDDING_CACHE_TTL", "604800")),
+        ),
+        async_client=vector_store.async_client,
+    )
+    return SemanticCache(
+        embedder,
+        threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95")),
+        ttl=float(os.getenv("SEMANTIC_CACHE_TTL", "3600")),
+        max_entries=int(os.getenv("SEMANTIC_CACHE_SIZE", "2000")),
+        index_version=vector_store.index_version,
     )
 
 
 def opensearch_vector_store(
-    index="dc-v2-work", region_name=os.getenv("AWS_REGION", "us-east-1")
+    index="dc-v2-work",
+    region_name=os.getenv("AWS_REGION", "us-east-1"),
+    client=None,
+    async_client=None,
 ):
-    session = boto3.Session(region_name=region_name)
-    awsauth = AWS4Auth(
-        region=region_name,
-        service="es",
-        refreshable_credentials=session.get_credentials(),
+    client = client or opensearch_client(region_name=region_name)
+
+    # Managed mode registers the normalization pipeline and a search template
+    # on the cluster (idempotently) and sends only template parameters
+    search_template = search_pipeline = None
+    if os.getenv("OPENSEARCH_SEARCH_MODE", "inline") == "managed":
+        from search_templates import register_search_template
+
+        search_template, search_pipeline = register_search_template(
+            client, name=prefix("hybrid-search")
+        )
+
+    async_client = async_client or opensearch_async_client(region_name=region_name)
+
+    # knn mode embeds queries through ML Commons once and caches the vectors,
+    # so repeated queries skip model inference on the cluster
+    embedder = None
+    if os.getenv("OPENSEARCH_VECTOR_QUERY", "neural") == "knn":
+        embedder = QueryEmbedder(
+            client,
+            os.getenv("OPENSEARCH_MODEL_ID"),
+            cache=search_cache(
+                backend=os.getenv("EMBEDDING_CACHE", "memory"),
+                table="embeddings",
+                ttl=float(os.getenv("EMBEDDING_CACHE_TTL", "604800")),
+            ),
+            async_client=async_client,
+        )
+
+    # Client-side fusion fetches the lexical and semantic legs separately
+    # (cached on their own) and combines them here instead of in the search
+    # pipeline, so reweighting needs no new cluster work
+    fusion = None
+    fusion_method = os.getenv("OPENSEARCH_HYBRID_FUSION", "server")
+    if fusion_method != "server":
+        fusion = Fusion(
+            method=fusion_method,
+            normalization=os.getenv("HYBRID_NORMALIZATION", "l2"),
+            weights=[
+                float(weight)
+                for weight in os.getenv("HYBRID_WEIGHTS", "0.25,0.75").split(",")
+            ],
+            rank_constant=int(os.getenv("HYBRID_RRF_RANK_CONSTANT", "60")),
+        )
+
+    # Aggregation fields are validated against the mapping, which is fetched
+    # on first use and re-fetched at most every MAPPING_REFRESH_INTERVAL
+    # seconds when an unknown field is requested
+    mappings = MappingRegistry(
+        client,
+        prefix(index),
+        async_client=async_client,
+        refresh_interval=float(os.getenv("MAPPING_REFRESH_INTERVAL", "60")),
     )
 
     docsearch = OpenSearchNeuralSearch(
         index=prefix(index),
         model_id=os.getenv("OPENSEARCH_MODEL_ID"),
         endpoint=opensearch_endpoint(),
-        connection_class=RequestsHttpConnection,
-        http_auth=awsauth,
+        client=client,
+        async_client=async_client,
+        embedder=embedder,
+        mappings=mappings,
+        fusion=fusion,
+        search_pipeline=search_pipeline,
+        search_template=search_template,
+        cache=search_cache(),
+        aggregation_cache=search_cache(
+            table="aggregations",
+            ttl=float(os.getenv("AGGREGATION_CACHE_TTL", "86400")),
+        ),
         text_field="id",
     )
-    return docsearch
-
-
-# Define the OpenSearch cluster connection
-opensearch_client = opensearch_client()
 
-# Retrieve cluster information
-info = opensearch_client.info()
-print(f"Connected to OpenSearch version {info['version']['number']}")
-
-
-opensearch_vector_store = opensearch_vector_store()
+    prewarm_fields = os.getenv("AGGREGATION_PREWARM_FIELDS", "")
+    if prewarm_fields and docsearch.aggregation_cache is not None:
+        docsearch.prewarm_aggregations(
+            [field.strip() for field in prewarm_fields.split(",") if field.strip()]
+        )
 
+    return docsearch
 
 
+if __name__ == "__main__":
+    # Retrieve cluster information
+    info = opensearch_client().info()
+    print(f"Connected to OpenSearch version {info['version']['number']}")
@@ -1,8 +1,38 @@
+import asyncio
+import threading
+
 from langchain_core.documents import Document
 from langchain_core.vectorstores import VectorStore
-from opensearchpy import OpenSearch
-from typing import Any, List, Tuple
-from hybrid_query import hybrid_query
+from opensearchpy import AsyncOpenSearch, OpenSearch
+from typing import Any, AsyncIterator, Iterator, List, Tuple
+from embeddings import QueryEmbedder
+from fusion import Fusion
+from hybrid_query import hybrid_query, lexical_query, semantic_query
+from mappings import MappingRegistry
+import tracing
+from search_cache import IndexVersion, SearchCache, cache_key
+
+SOURCE_FIELDS = ["id", "title", "description", "alternative_title"]
+
+# Only the parts of a response that are read are sent back and decoded
+SEARCH_FILTER_PATH = "took,hits.hits._score,hits.hits._source"
+MSEARCH_FILTER_PATH = (
+    "took,responses.status,responses.error,"
+    "responses.hits.hits._score,responses.hits.hits._source"
+)
+AGGREGATIONS_FILTER_PATH = "took,aggregations"
+MSEARCH_AGGREGATIONS_FILTER_PATH = (
+    "took,responses.status,responses.error,responses.aggregations"
+)
+# HyperLogLog distinct counts are approximate; near-exact below this many
+# values. Higher thresholds cost more memory per shard.
+CARDINALITY_PRECISION = 40000
+COMPOSITE_FILTER_PATH = (
+    "took,aggregations.buckets.after_key,aggregations.buckets.buckets"
+)
+PAGE_FILTER_PATH = "took,pit_id,hits.hits._score,hits.hits._source,hits.hits.sort"
+# Sub-queries of a hybrid search, in the order their fusion weights are given
+LEGS = ("lexical", "semantic")
 
 
 class OpenSearchNeuralSearch(VectorStore):
@@ -14,19 +44,44 @@ class OpenSearchNeuralSearch(VectorStore):
         index: str,
         model_id: str,
         client: OpenSearch = None,
+        async_client: AsyncOpenSearch = None,
         vector_field: str = "embedding",
         search_pipeline: str = None,
+        search_template: str = None,
         text_field: str = "id",
+        cache: SearchCache = None,
+        aggregation_cache: SearchCache = None,
+        index_version: IndexVersion = None,
+        embedder: QueryEmbedder = None,
+        mappings: MappingRegistry = None,
+        fusion: Fusion = None,
         **kwargs: Any,
     ):
         self.client = client or OpenSearch(
             hosts=[{"host": endpoint, "port": "443", "use_ssl": True}], **kwargs
         )
+        self.async_client = async_client
         self.index = index
         self.model_id = model_id
         self.vector_field = vector_field
         self.search_pipeline = search_pipeline
+        self.search_template = search_template
+        self._inline_fallbacks = set()
         self.text_field = text_field
+        self.cache = cache
+        self.aggregation_cache = aggregation_cache
+        self.index_version = index_version or IndexVersion(
+            self.client, index, async_client=async_client
+        )
+        # When set, queries are embedded (and cached) client-side and searched
+        # with a knn clause instead of a neural one
+        self.embedder = embedder
+        # When set, aggregation fields are checked against the index mapping
+        # (and text fields swapped for their .keyword subfield) before sending
+        self.mappings = mappings
+        # When set, the lexical and semantic legs are fetched and cached
+        # separately and fused here instead of by the search pipeline
+        self.fusion = fusion
 
     def similarity_search(
         self, query: str, k: int = 10, **kwargs: Any
@@ -39,60 +94,966 @@ class OpenSearchNeuralSearch(VectorStore):
         self, query: str, k: int = 10, **kwargs: Any
     ) -> List[Tuple[Document, float]]:
         """Return docs most similar to query."""
+        if self.fusion is not None:
+            return self.fused_search_batch_with_score([query], k, **kwargs)[0]
+
+        def search():
+            vector = self.embedder.embed(query) if self.embedder else None
+            response = self._search(self.client, query, k, vector, **kwargs)
+            _trace_response(span, response)
+            return _hits(response)
+
+        with tracing.span(
+            "opensearch.similarity_search",
+            query_length=len(query),
+            k=k,
+            cached=True,
+        ) as span:
+            if self.cache is None:
+                hits = search()
+            else:
+                hits = self.cache.get_or_compute(
+                    self._cache_key(query, k, **kwargs), search
+                )
+            span.set(hits=len(hits))
+            return self._documents_with_scores(hits)
+
+    async def asimilarity_search(
+        self, query: str, k: int = 10, **kwargs: Any
+    ) -> List[Document]:
+        """Asynchronously return docs most similar to the embedding vector."""
+        docs_with_scores = await self.asimilarity_search_with_score(
+            query, k, **kwargs
+        )
+        return [doc[0] for doc in docs_with_scores]
+
+    async def asimilarity_search_with_score(
+        self, query: str, k: int = 10, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """Asynchronously return docs most similar to query."""
+        if self.fusion is not None:
+            return (await self.afused_search_batch_with_score([query], k, **kwargs))[0]
+
+        async def search():
+            vector = await self.embedder.aembed(query) if self.embedder else None
+            response = await self._search(
+                self._require_async_client(), query, k, vector, **kwargs
+            )
+            _trace_response(span, response)
+            return _hits(response)
+
+        with tracing.span(
+            "opensearch.similarity_search",
+            query_length=len(query),
+            k=k,
+            cached=True,
+        ) as span:
+            if self.cache is None:
+                hits = await search()
+            else:
+                hits = await self.cache.aget_or_compute(
+                    self._cache_key(query, k, **kwargs), search
+                )
+            span.set(hits=len(hits))
+            return self._documents_with_scores(hits)
+
+    def similarity_search_batch(
+        self, queries: List[str], k: int = 10, **kwargs: Any
+    ) -> List[List[Document]]:
+        """Return docs most similar to each query, using a single _msearch request."""
+        return [
+            [doc[0] for doc in docs_with_scores]
+            for docs_with_scores in self.similarity_search_batch_with_score(
+                queries, k, **kwargs
+            )
+        ]
+
+    def similarity_search_batch_with_score(
+        self, queries: List[str], k: int = 10, **kwargs: Any
+    ) -> List[List[Tuple[Document, float]]]:
+        """Return docs most similar to each query, using a single _msearch request."""
+        if self.fusion is not None:
+            return self.fused_search_batch_with_score(queries, k, **kwargs)
+        with tracing.span(
+            "opensearch.msearch",
+            queries=len(queries),
+            query_length=sum(len(query) for query in queries),
+            k=k,
+        ) as span:
+            hits, missing = self._cached_batch_hits(queries, k, **kwargs)
+            span.set(cache_misses=len(missing))
+            if missing:
+                missing_queries = [queries[i] for i in missing]
+                vectors = (
+                    self.embedder.embed_many(missing_queries) if self.embedder else None
+                )
+                response = self._msearch(
+                    self.client, missing_queries, k, vectors, **kwargs
+                )
+                _trace_response(span, response)
+                self._fill_batch_hits(queries, k, hits, missing, response, **kwargs)
+            span.set(hits=sum(len(query_hits) for query_hits in hits))
+            return [self._documents_with_scores(query_hits) for query_hits in hits]
+
+    async def asimilarity_search_batch(
+        self, queries: List[str], k: int = 10, **kwargs: Any
+    ) -> List[List[Document]]:
+        """Asynchronously return docs most similar to each query, using a single _msearch request."""
+        return [
+            [doc[0] for doc in docs_with_scores]
+            for docs_with_scores in await self.asimilarity_search_batch_with_score(
+                queries, k, **kwargs
+            )
+        ]
+
+    async def asimilarity_search_batch_with_score(
+        self, queries: List[str], k: int = 10, **kwargs: Any
+    ) -> List[List[Tuple[Document, float]]]:
+        """Asynchronously return docs most similar to each query, using a single _msearch request."""
+        if self.fusion is not None:
+            return await self.afused_search_batch_with_score(queries, k, **kwargs)
+        with tracing.span(
+            "opensearch.msearch",
+            queries=len(queries),
+            query_length=sum(len(query) for query in queries),
+            k=k,
+        ) as span:
+            hits, missing = self._cached_batch_hits(queries, k, **kwargs)
+            span.set(cache_misses=len(missing))
+            if missing:
+                missing_queries = [queries[i] for i in missing]
+                vectors = (
+                    await self.embedder.aembed_many(missing_queries)
+                    if self.embedder
+                    else None
+                )
+                response = await self._msearch(
+                    self._require_async_client(),
+                    missing_queries,
+                    k,
+                    vectors,
+                    **kwargs,
+                )
+                _trace_response(span, response)
+                self._fill_batch_hits(queries, k, hits, missing, response, **kwargs)
+            span.set(hits=sum(len(query_hits) for query_hits in hits))
+            return [self._documents_with_scores(query_hits) for query_hits in hits]
+
+    def fused_search_batch_with_score(
+        self, queries: List[str], k: int = 10, fusion: Fusion = None, **kwargs: Any
+    ) -> List[List[Tuple[Document, float]]]:
+        """Search each query's lexical and semantic legs and fuse them client-side.
+
+        Every uncached leg of every query goes out in one _msearch request.
+        Legs are cached on their own, so fusing the same queries again with a
+        different `fusion` (weights, normalization or RRF) makes no request.
+        """
+        fusion = fusion or self.fusion or Fusion()
+        with tracing.span(
+            "opensearch.fused_search", queries=len(queries), k=k, fusion=fusion.method
+        ) as span:
+            legs, missing = self._cached_legs(queries, k, **kwargs)
+            span.set(cache_misses=len(missing))
+            if missing:
+                semantic = [queries[i] for i, leg in missing if leg == "semantic"]
+                vectors = (
+                    dict(zip(semantic, self.embedder.embed_many(semantic)))
+                    if self.embedder and semantic
+                    else {}
+                )
+                response = self.client.msearch(
+                    index=self.index,
+                    body=self._legs_msearch_body(
+                        queries, k, missing, vectors, **kwargs
+                    ),
+                    params={"filter_path": MSEARCH_FILTER_PATH},
+                )
+                _trace_response(span, response)
+                self._fill_legs(queries, k, legs, missing, response, **kwargs)
+            return self._fused_documents(fusion, legs, span, **kwargs)
+
+    async def afused_search_batch_with_score(
+        self, queries: List[str], k: int = 10, fusion: Fusion = None, **kwargs: Any
+    ) -> List[List[Tuple[Document, float]]]:
+        """Asynchronously search and fuse each query's legs client-side."""
+        fusion = fusion or self.fusion or Fusion()
+        with tracing.span(
+            "opensearch.fused_search", queries=len(queries), k=k, fusion=fusion.method
+        ) as span:
+            legs, missing = self._cached_legs(queries, k, **kwargs)
+            span.set(cache_misses=len(missing))
+            if missing:
+                semantic = [queries[i] for i, leg in missing if leg == "semantic"]
+                vectors = (
+                    dict(zip(semantic, await self.embedder.aembed_many(semantic)))
+                    if self.embedder and semantic
+                    else {}
+                )
+                response = await self._require_async_client().msearch(
+                    index=self.index,
+                    body=self._legs_msearch_body(
+                        queries, k, missing, vectors, **kwargs
+                    ),
+                    params={"filter_path": MSEARCH_FILTER_PATH},
+                )
+                _trace_response(span, response)
+                self._fill_legs(queries, k, legs, missing, response, **kwargs)
+            return self._fused_documents(fusion, legs, span, **kwargs)
+
+    def iter_search(
+        self,
+        query: str,
+        batch_size: int = 100,
+        keep_alive: str = "1m",
+        tiebreaker: str = "id",
+    ) -> Iterator[Document]:
+        """Lazily yield every doc matching query, best first.
+
+        Pages through a point in time with search_after, holding one page in
+        memory at a time; the point in time is closed when the generator is
+        exhausted or closed. Only the lexical leg of the hybrid query is used,
+        since the neural leg returns a fixed top k rather than every match.
+        """
+        pit_id = self.client.create_pit(
+            index=self.index, params={"keep_alive": keep_alive}
+        )["pit_id"]
+        try:
+            search_after = None
+            while True:
+                with tracing.span(
+                    "opensearch.iter_search", query_length=len(query)
+                ) as span:
+                    response = self.client.search(
+                        body=self._page_dsl(
+                            query,
+                            pit_id,
+                            keep_alive,
+                            batch_size,
+                            tiebreaker,
+                            search_after,
+                        ),
+                        params={"filter_path": PAGE_FILTER_PATH},
+                    )
+                    _trace_response(span, response)
+                pit_id = response.get("pit_id", pit_id)
+                hits = _hits(response)
+                for document, _ in self._documents_with_scores(hits):
+                    yield document
+                if len(hits) < batch_size:
+                    return
+                search_after = hits[-1]["sort"]
+        finally:
+            self.client.delete_pit(body={"pit_id": [pit_id]})
+
+    async def aiter_search(
+        self,
+        query: str,
+        batch_size: int = 100,
+        keep_alive: str = "1m",
+        tiebreaker: str = "id",
+    ) -> AsyncIterator[Document]:
+        """Asynchronously and lazily yield every doc matching query, best first."""
+        client = self._require_async_client()
+        pit_id = (
+            await client.create_pit(index=self.index, params={"keep_alive": keep_alive})
+        )["pit_id"]
+        try:
+            search_after = None
+            while True:
+                with tracing.span(
+                    "opensearch.iter_search", query_length=len(query)
+                ) as span:
+                    response = await client.search(
+                        body=self._page_dsl(
+                            query,
+                            pit_id,
+                            keep_alive,
+                            batch_size,
+                            tiebreaker,
+                            search_after,
+                        ),
+                        params={"filter_path": PAGE_FILTER_PATH},
+                    )
+                    _trace_response(span, response)
+                pit_id = response.get("pit_id", pit_id)
+                hits = _hits(response)
+                for document, _ in self._documents_with_scores(hits):
+                    yield document
+                if len(hits) < batch_size:
+                    return
+                search_after = hits[-1]["sort"]
+        finally:
+            await client.delete_pit(body={"pit_id": [pit_id]})
+
+    def add_texts(self, texts: List[str], metadatas: List[dict], **kwargs: Any) -> None:
+        pass
+
+    @classmethod
+    def from_texts(cls, texts: List[str], metadatas: List[dict], **kwargs: Any) -> None:
+        pass
+
+    def aggregations_search(
+        self, field: str, distinct_count: bool = False, **kwargs: Any
+    ) -> dict:
+        """Perform a search with aggregations and return the aggregation results.
+
+        With distinct_count the result also has distinct_count.value, the
+        approximate number of different values of field.
+        """
+        field = self._resolve_field(field)
+
+        def search():
+            response = self.client.search(
+                index=self.index,
+                body=self._aggregations_dsl(field, distinct_count),
+                params=self._search_params(AGGREGATIONS_FILTER_PATH),
+            )
+            _trace_response(span, response)
+            return response.get("aggregations", {})
+
+        with tracing.span(
+            "opensearch.aggregations", field=field, cached=True
+        ) as span:
+            if self.aggregation_cache is None:
+                return search()
+            return self.aggregation_cache.get_or_compute(
+                self._aggregations_cache_key(
+                    field,
+                    self.index_version.current(),
+                    kind=_aggregations_kind(distinct_count),
+                ),
+                search,
+            )
+
+    async def aaggregations_search(
+        self, field: str, distinct_count: bool = False, **kwargs: Any
+    ) -> dict:
+        """Asynchronously perform a search with aggregations and return the aggregation results."""
+        field = await self._aresolve_field(field)
+
+        async def search():
+            response = await self._require_async_client().search(
+                index=self.index,
+                body=self._aggregations_dsl(field, distinct_count),
+                params=self._search_params(AGGREGATIONS_FILTER_PATH),
+            )
+            _trace_response(span, response)
+            return response.get("aggregations", {})
+
+        with tracing.span(
+            "opensearch.aggregations", field=field, cached=True
+        ) as span:
+            if self.aggregation_cache is None:
+                return await search()
+            return await self.aggregation_cache.aget_or_compute(
+                self._aggregations_cache_key(
+                    field,
+                    await self.index_version.acurrent(),
+                    kind=_aggregations_kind(distinct_count),
+                ),
+                search,
+            )
+
+    def aggregations_search_many(
+        self, fields: List[str], chunk_size: int = 50, distinct_count: bool = False
+    ) -> dict:
+        """Aggregate several fields with one _msearch request per chunk_size fields.
+
+        Returns {"results": {field: aggregations}, "errors": {field: reason}},
+        keyed by the fields as given (title, not its resolved title.keyword).
+        A field that fails (e.g. an unaggregatable text field) only shows up in
+        errors. Cached fields are not requested again, and with a mapping
+        registry unknown fields are reported without being requested at all.
+        """
+        with tracing.span("opensearch.aggregations_many", fields=len(fields)) as span:
+            requested, invalid = self._resolve_fields(fields)
+            version = self.index_version.current() if self.aggregation_cache else None
+            results, errors, missing = self._cached_aggregations(
+                list(dict.fromkeys(requested.values())), version, distinct_count
+            )
+            span.set(cache_misses=len(missing))
+            for chunk in _chunks(missing, chunk_size):
+                response = self.client.msearch(
+                    index=self.index,
+                    body=self._aggregations_msearch_body(chunk, distinct_count),
+                    params=self._search_params(MSEARCH_AGGREGATIONS_FILTER_PATH),
+                )
+                _trace_response(span, response)
+                self._fill_aggregations(
+                    chunk, response, version, results, errors, distinct_count
+                )
+            return _by_requested(requested, invalid, results, errors)
+
+    async def aaggregations_search_many(
+        self, fields: List[str], chunk_size: int = 50, distinct_count: bool = False
+    ) -> dict:
+        """Asynchronously aggregate several fields, one _msearch request per chunk."""
+        client = self._require_async_client()
+        with tracing.span("opensearch.aggregations_many", fields=len(fields)) as span:
+            requested, invalid = await self._aresolve_fields(fields)
+            version = (
+                await self.index_version.acurrent() if self.aggregation_cache else None
+            )
+            results, errors, missing = self._cached_aggregations(
+                list(dict.fromkeys(requested.values())), version, distinct_count
+            )
+            span.set(cache_misses=len(missing))
+            chunks = list(_chunks(missing, chunk_size))
+            responses = await asyncio.gather(
+                *(
+                    client.msearch(
+                        index=self.index,
+                        body=self._aggregations_msearch_body(chunk, distinct_count),
+                        params=self._search_params(MSEARCH_AGGREGATIONS_FILTER_PATH),
+                    )
+                    for chunk in chunks
+                )
+            )
+            for chunk, response in zip(chunks, responses):
+                _trace_response(span, response)
+                self._fill_aggregations(
+                    chunk, response, version, results, errors, distinct_count
+                )
+            return _by_requested(requested, invalid, results, errors)
+
+    def cardinality(self, field: str) -> int:
+        """Return the approximate number of distinct values of field."""
+        field = self._resolve_field(field)
+
+        def search():
+            response = self.client.search(
+                index=self.index,
+                body=self._cardinality_dsl(field),
+                params=self._search_params(AGGREGATIONS_FILTER_PATH),
+            )
+            _trace_response(span, response)
+            return response["aggregations"]["distinct_count"]["value"]
+
+        with tracing.span("opensearch.cardinality", field=field, cached=True) as span:
+            if self.aggregation_cache is None:
+                return search()
+            return self.aggregation_cache.get_or_compute(
+                self._aggregations_cache_key(
+                    field, self.index_version.current(), kind="cardinality"
+                ),
+                search,
+            )
+
+    async def acardinality(self, field: str) -> int:
+        """Asynchronously return the number of distinct values of field."""
+        field = await self._aresolve_field(field)
+
+        async def search():
+            response = await self._require_async_client().search(
+                index=self.index,
+                body=self._cardinality_dsl(field),
+                params=self._search_params(AGGREGATIONS_FILTER_PATH),
+            )
+            _trace_response(span, response)
+            return response["aggregations"]["distinct_count"]["value"]
+
+        with tracing.span("opensearch.cardinality", field=field, cached=True) as span:
+            if self.aggregation_cache is None:
+                return await search()
+            return await self.aggregation_cache.aget_or_compute(
+                self._aggregations_cache_key(
+                    field, await self.index_version.acurrent(), kind="cardinality"
+                ),
+                search,
+            )
+
+    def iter_buckets(
+        self, field: str, page_size: int = 500, limit: int = None
+    ) -> Iterator[dict]:
+        """Lazily yield every {"key", "doc_count"} bucket of field, in key order.
+
+        Pages through a composite aggregation with after_key, so memory on the
+        client and the coordinating node stays bounded by page_size. Buckets
+        come in key order, not by frequency: limit stops after the first limit
+        keys, which are not the most common values. Use aggregations_search
+        for the top values by count.
+        """
+        field = self._resolve_field(field)
+        after_key, yielded = None, 0
+        while True:
+            with tracing.span("opensearch.composite", field=field) as span:
+                response = self.client.search(
+                    index=self.index,
+                    body=self._composite_dsl(field, page_size, after_key),
+                    params=self._search_params(COMPOSITE_FILTER_PATH),
+                )
+                _trace_response(span, response)
+            page = response.get("aggregations", {}).get("buckets", {})
+            for bucket in page.get("buckets", []):
+                yield {"key": bucket["key"][field], "doc_count": bucket["doc_count"]}
+                yielded += 1
+                if limit is not None and yielded >= limit:
+                    return
+            after_key = page.get("after_key")
+            if after_key is None or len(page.get("buckets", [])) < page_size:
+                return
+
+    async def aiter_buckets(
+        self, field: str, page_size: int = 500, limit: int = None
+    ) -> AsyncIterator[dict]:
+        """Asynchronously and lazily yield every bucket of field, in key (not count) order."""
+        client = self._require_async_client()
+        field = await self._aresolve_field(field)
+        after_key, yielded = None, 0
+        while True:
+            with tracing.span("opensearch.composite", field=field) as span:
+                response = await client.search(
+                    index=self.index,
+                    body=self._composite_dsl(field, page_size, after_key),
+                    params=self._search_params(COMPOSITE_FILTER_PATH),
+                )
+                _trace_response(span, response)
+            page = response.get("aggregations", {}).get("buckets", {})
+            for bucket in page.get("buckets", []):
+                yield {"key": bucket["key"][field], "doc_count": bucket["doc_count"]}
+                yielded += 1
+                if limit is not None and yielded >= limit:
+                    return
+            after_key = page.get("after_key")
+            if after_key is None or len(page.get("buckets", [])) < page_size:
+                return
+
+    def prewarm_aggregations(self, fields: List[str]) -> threading.Thread:
+        """Load aggregation results for `fields` into the cache on a background thread."""
+
+        def prewarm():
+            for field in fields:
+                try:
+                    self.aggregations_search(field)
+                except Exception as e:
+                    print(f"Could not pre-warm {field} aggregation: {e}")
+
+        thread = threading.Thread(
+            target=prewarm, name="aggregation-prewarm", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def _similarity_search_dsl(
+        self, query: str, k: int, vector: List[float] = None, **kwargs: Any
+    ) -> dict:
         dsl = hybrid_query(
             query=query,
             model_id=self.model_id,
             vector_field=self.vector_field,
             k=k,
+            vector=vector,
             **kwargs,
         )
+        if self.search_pipeline:
+            # The registered pipeline goes with the request parameters, and
+            # OpenSearch rejects a search naming one that also has it inline
+            dsl.pop("search_pipeline", None)
+
+        dsl["_source"] = SOURCE_FIELDS
+        return dsl
 
-        dsl["_source"] = ["id", "title", "description", "alternative_title"]
+    def _leg_dsl(
+        self, leg: str, query: str, k: int, vector: List[float] = None, **kwargs: Any
+    ) -> dict:
+        if leg == "lexical":
+            leg_query = lexical_query(query)
+        else:
+            leg_query = semantic_query(
+                query, self.model_id, self.vector_field, k, vector
+            )
+        dsl = {"size": kwargs.get("size", 20), "query": leg_query, **kwargs}
+        dsl["_source"] = SOURCE_FIELDS
+        return dsl
+
+    def _legs_msearch_body(
+        self, queries: List[str], k: int, missing, vectors: dict, **kwargs: Any
+    ) -> List[dict]:
+        body = []
+        for i, leg in missing:
+            body.append({})
+            body.append(
+                self._leg_dsl(leg, queries[i], k, vectors.get(queries[i]), **kwargs)
+            )
+        return body
+
+    def _page_dsl(
+        self,
+        query: str,
+        pit_id: str,
+        keep_alive: str,
+        batch_size: int,
+        tiebreaker: str,
+        search_after: list = None,
+    ) -> dict:
+        # Searches against a point in time name no index
+        dsl = {
+            "size": batch_size,
+            "query": lexical_query(query),
+            "pit": {"id": pit_id, "keep_alive": keep_alive},
+            "sort": [{"_score": "desc"}, {tiebreaker: "asc"}],
+            "track_total_hits": False,
+            "_source": SOURCE_FIELDS,
+        }
+        if search_after is not None:
+            dsl["search_after"] = search_after
+        return dsl
+
+    def _uses_template(self, knn: bool, **kwargs: Any) -> bool:
+        """Whether a search can be sent as the registered search template.
+
+        The template runs a neural query and only takes `size`, so knn query
+        vectors and any other option fall back to the inline DSL, still with
+        the registered pipeline. Each kind of fallback is logged once.
+        """
+        if self.search_template is None:
+            return False
+        if knn:
+            reason = "knn query vectors"
+        else:
+            options = sorted(set(kwargs) - {"size"})
+            if not options:
+                return True
+            reason = f"options {', '.join(options)}"
+        if reason not in self._inline_fallbacks:
+            self._inline_fallbacks.add(reason)
+            print(
+                f"Search template {self.search_template} does not take {reason}; "
+                "sending the inline query instead"
+            )
+        return False
+
+    def _template_body(self, query: str, k: int, **kwargs: Any) -> dict:
+        return {
+            "id": self.search_template,
+            "params": {
+                "query": query,
+                "k": k,
+                "size": kwargs.get("size", 20),
+                "model_id": self.model_id,
+            },
+        }
 
-        response = self.client.search(
+    def _search(
+        self, client, query: str, k: int, vector: List[float] = None, **kwargs: Any
+    ):
+        # Works for both clients: the async client returns a coroutine
+        if self._uses_template(vector is not None, **kwargs):
+            return client.search_template(
+                index=self.index,
+                body=self._template_body(query, k, **kwargs),
+                params=self._search_params(SEARCH_FILTER_PATH),
+            )
+        return client.search(
             index=self.index,
-            body=dsl,
-            params=(
-                {"search_pipeline": self.search_pipeline}
-                if self.search_pipeline
-                else None
+            body=self._similarity_search_dsl(query, k, vector, **kwargs),
+            params=self._search_params(SEARCH_FILTER_PATH),
+        )
+
+    def _msearch(
+        self,
+        client,
+        queries: List[str],
+        k: int,
+        vectors: List[List[float]] = None,
+        **kwargs: Any,
+    ):
+        if self._uses_template(vectors is not None, **kwargs):
+            return client.msearch_template(
+                index=self.index,
+                body=self._msearch_body(queries, k, self._template_body, **kwargs),
+                params=self._search_params(MSEARCH_FILTER_PATH),
+            )
+        return client.msearch(
+            index=self.index,
+            body=self._msearch_body(
+                queries, k, self._similarity_search_dsl, vectors, **kwargs
             ),
+            params=self._search_params(MSEARCH_FILTER_PATH),
         )
-        documents_with_scores = [
+
+    def _msearch_body(
+        self,
+        queries: List[str],
+        k: int,
+        request,
+        vectors: List[List[float]] = None,
+        **kwargs: Any,
+    ) -> List[dict]:
+        body = []
+        for i, query in enumerate(queries):
+            body.append({})
+            if vectors is None:
+                body.append(request(query, k, **kwargs))
+            else:
+                body.append(request(query, k, vectors[i], **kwargs))
+        return body
+
+    def _aggregations_dsl(self, field: str, distinct_count: bool = False) -> dict:
+        aggs = {"aggregation_result": {"terms": {"field": field}}}
+        if distinct_count:
+            # Answers "how many different X" without the full list of terms
+            aggs["distinct_count"] = self._cardinality_agg(field)
+        return {"size": 0, "aggs": aggs}
+
+    def _resolve_field(self, field: str) -> str:
+        return self.mappings.resolve(field) if self.mappings else field
+
+    async def _aresolve_field(self, field: str) -> str:
+        return await self.mappings.aresolve(field) if self.mappings else field
+
+    def _resolve_fields(self, fields: List[str]):
+        # Returns {requested field: resolved field} and {requested field: reason}
+        resolved, invalid = {}, {}
+        for field in dict.fromkeys(fields):
+            try:
+                resolved[field] = self._resolve_field(field)
+            except ValueError as e:
+                invalid[field] = str(e)
+        return resolved, invalid
+
+    async def _aresolve_fields(self, fields: List[str]):
+        resolved, invalid = {}, {}
+        for field in dict.fromkeys(fields):
+            try:
+                resolved[field] = await self._aresolve_field(field)
+            except ValueError as e:
+                invalid[field] = str(e)
+        return resolved, invalid
+
+    def _aggregations_msearch_body(
+        self, fields: List[str], distinct_count: bool = False
+    ) -> List[dict]:
+        body = []
+        for field in fields:
+            body.append({})
+            body.append(self._aggregations_dsl(field, distinct_count))
+        return body
+
+    def _cached_aggregations(
+        self, fields: List[str], index_version: str, distinct_count: bool = False
+    ):
+        results, errors = {}, {}
+        if self.aggregation_cache is None:
+            return results, errors, fields
+        missing = []
+        for field in fields:
+            cached = self.aggregation_cache.get(
+                self._aggregations_cache_key(
+                    field, index_version, kind=_aggregations_kind(distinct_count)
+                )
+            )
+            if cached is None:
+                missing.append(field)
+            else:
+                results[field] = cached
+        return results, errors, missing
+
+    def _fill_aggregations(
+        self,
+        fields: List[str],
+        response: dict,
+        index_version,
+        results,
+        errors,
+        distinct_count: bool = False,
+    ) -> None:
+        for field, item in zip(fields, response["responses"]):
+            if "error" in item:
+                errors[field] = _error_reason(item["error"])
+                continue
+            results[field] = item.get("aggregations", {})
+            if self.aggregation_cache is not None:
+                self.aggregation_cache.set(
+                    self._aggregations_cache_key(
+                        field, index_version, kind=_aggregations_kind(distinct_count)
+                    ),
+                    results[field],
+                )
+
+    def _cardinality_agg(self, field: str) -> dict:
+        return {
+            "cardinality": {
+                "field": field,
+                "precision_threshold": CARDINALITY_PRECISION,
+            }
+        }
+
+    def _cardinality_dsl(self, field: str) -> dict:
+        return {"size": 0, "aggs": {"distinct_count": self._cardinality_agg(field)}}
+
+    def _composite_dsl(
+        self, field: str, page_size: int, after_key: dict = None
+    ) -> dict:
+        composite = {
+            "sources": [{field: {"terms": {"field": field}}}],
+            "size": page_size,
+        }
+        if after_key is not None:
+            composite["after"] = after_key
+        return {"size": 0, "aggs": {"buckets": {"composite": composite}}}
+
+    def _search_params(self, filter_path: str) -> dict:
+        params = {"filter_path": filter_path}
+        if self.search_pipeline:
+            params["search_pipeline"] = self.search_pipeline
+        return params
+
+    def _documents_with_scores(self, hits: List[dict]) -> List[Tuple[Document, float]]:
+        # Copy _source so callers editing metadata never touch cached hits
+        return [
             (
                 Document(
                     page_content=hit["_source"][self.text_field],
-                    metadata=(hit["_source"]),
+                    metadata=dict(hit["_source"]),
                 ),
                 hit["_score"],
             )
-            for hit in response["hits"]["hits"]
+            for hit in hits
         ]
 
-        return documents_with_scores
-
-    def add_texts(self, texts: List[str], metadatas: List[dict], **kwargs: Any) -> None:
-        pass
-
-    @classmethod
-    def from_texts(cls, texts: List[str], metadatas: List[dict], **kwargs: Any) -> None:
-        pass
+    def _cache_key(self, query: str, k: int, **kwargs: Any) -> str:
+        return cache_key(
+            "similarity_search",
+            query,
+            index=self.index,
+            model_id=self.model_id,
+            vector_field=self.vector_field,
+            search_pipeline=self.search_pipeline,
+            search_template=self.search_template,
+            vector_query="knn" if self.embedder else "neural",
+            k=k,
+            **kwargs,
+        )
 
-    def aggregations_search(self, field: str, **kwargs: Any) -> dict:
-        """Perform a search with aggregations and return the aggregation results."""
-        dsl = {
-            "size": 0,
-            "aggs": {"aggregation_result": {"terms": {"field": field}}},
-        }
+    def _leg_cache_key(self, leg: str, query: str, k: int, **kwargs: Any) -> str:
+        # The lexical leg does not depend on k, so it is shared across k values
+        return cache_key(
+            "hybrid_leg",
+            query,
+            leg=leg,
+            index=self.index,
+            model_id=self.model_id,
+            vector_field=self.vector_field,
+            vector_query="knn" if self.embedder else "neural",
+            k=k if leg == "semantic" else None,
+            **kwargs,
+        )
 
-        response = self.client.search(
+    def _aggregations_cache_key(
+        self, field: str, index_version: str, kind: str = "terms"
+    ) -> str:
+        return cache_key(
+            "aggregations_search",
+            "",
             index=self.index,
-            body=dsl,
-            params=(
-                {"search_pipeline": self.search_pipeline}
-                if self.search_pipeline
-                else None
-            ),
+            field=field,
+            kind=kind,
+            index_version=index_version,
         )
 
-        return response.get("aggregations", {})
+    def _cached_batch_hits(self, queries: List[str], k: int, **kwargs: Any):
+        if self.cache is None:
+            return [None] * len(queries), list(range(len(queries)))
+
+        hits = [self.cache.get(self._cache_key(query, k, **kwargs)) for query in queries]
+        return hits, [i for i, query_hits in enumerate(hits) if query_hits is None]
+
+    def _fill_batch_hits(
+        self,
+        queries: List[str],
+        k: int,
+        hits: List,
+        missing: List[int],
+        response: dict,
+        **kwargs: Any,
+    ) -> None:
+        for i, item in zip(missing, response["responses"]):
+            if "error" in item:
+                raise RuntimeError(f"msearch sub-request failed: {item['error']}")
+            hits[i] = _hits(item)
+            if self.cache is not None:
+                self.cache.set(self._cache_key(queries[i], k, **kwargs), hits[i])
+
+    def _cached_legs(self, queries: List[str], k: int, **kwargs: Any):
+        legs = [[None] * len(LEGS) for _ in queries]
+        missing = []
+        for i, query in enumerate(queries):
+            for j, leg in enumerate(LEGS):
+                if self.cache is not None:
+                    legs[i][j] = self.cache.get(
+                        self._leg_cache_key(leg, query, k, **kwargs)
+                    )
+                if legs[i][j] is None:
+                    missing.append((i, leg))
+        return legs, missing
+
+    def _fill_legs(
+        self, queries: List[str], k: int, legs, missing, response: dict, **kwargs: Any
+    ) -> None:
+        for (i, leg), item in zip(missing, response["responses"]):
+            if "error" in item:
+                raise RuntimeError(f"msearch sub-request failed: {item['error']}")
+            legs[i][LEGS.index(leg)] = _hits(item)
+            if self.cache is not None:
+                self.cache.set(
+                    self._leg_cache_key(leg, queries[i], k, **kwargs), _hits(item)
+                )
+
+    def _fused_documents(
+        self, fusion: Fusion, legs, span, **kwargs: Any
+    ) -> List[List[Tuple[Document, float]]]:
+        size = kwargs.get("size", 20)
+        hits = [
+            fusion.fuse(query_legs, size, key=self.text_field) for query_legs in legs
+        ]
+        span.set(hits=sum(len(query_hits) for query_hits in hits))
+        return [self._documents_with_scores(query_hits) for query_hits in hits]
+
+    def _require_async_client(self) -> AsyncOpenSearch:
+        if self.async_client is None:
+            raise RuntimeError(
+                "OpenSearchNeuralSearch was created without an async_client"
+            )
+        return self.async_client
+
+
+def _trace_response(span, response: dict) -> None:
+    # `took` is the server-side time; anything above it in the span is
+    # transport, serialization and client overhead
+    span.set(took=response.get("took"), cached=False)
+    attempts = span.get("http_attempts")
+    if attempts:
+        span.set(retries=attempts - 1)
+
+
+def _hits(response: dict) -> List[dict]:
+    # filter_path drops `hits` entirely when nothing matched
+    return response.get("hits", {}).get("hits", [])
+
+
+def _by_requested(requested: dict, invalid: dict, results: dict, errors: dict):
+    """Key aggregation results and errors by the field names the caller used."""
+    response = {"results": {}, "errors": dict(invalid)}
+    for field, resolved in requested.items():
+        if resolved in results:
+            response["results"][field] = results[resolved]
+        else:
+            response["errors"][field] = errors.get(resolved, "no response")
+    return response
+
+
+def _aggregations_kind(distinct_count: bool) -> str:
+    return "terms_distinct_count" if distinct_count else "terms"
+
+
+def _chunks(items: List, size: int):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def _error_reason(error) -> str:
+    if isinstance(error, dict):
+        root_causes = error.get("root_cause") or [error]
+        return str(root_causes[0].get("reason") or error.get("type") or error)
+    return str(error)
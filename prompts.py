@@ -0,0 +1,43 @@
+from typing import Callable, List
+
+
+class LayeredInstructions:
+    """Agent instructions split into a static prefix and a per-turn context tail.
+
+    Providers cache the longest prompt prefix they have seen before, so text
+    that changes every turn (the user's name, the current sources) must not sit
+    at the top of the system prompt. `static` never changes; `context` renders
+    the changing part from `context_variables`. Called like a plain Swarm
+    instructions function it returns both, static first.
+    """
+
+    def __init__(self, static: str, context: Callable[[dict], str] = None):
+        self.static = static
+        self.context = context
+        self.__name__ = getattr(context, "__name__", "instructions")
+
+    def context_text(self, context_variables: dict) -> str:
+        return self.context(context_variables) if self.context else ""
+
+    def __call__(self, context_variables: dict) -> str:
+        return "\n\n".join(
+            filter(None, [self.static, self.context_text(context_variables)])
+        )
+
+
+def layout_messages(instructions, history: List[dict], context_variables: dict):
+    """Build the messages of a completion with the stable parts first.
+
+    Layered instructions become a leading system message with the static text,
+    then the (append-only) history, then a trailing system message with the
+    per-turn context. Plain instructions keep Swarm's single system message.
+    """
+    if isinstance(instructions, LayeredInstructions):
+        messages = [{"role": "system", "content": instructions.static}] + history
+        context = instructions.context_text(context_variables)
+        if context:
+            messages.append({"role": "system", "content": context})
+        return messages
+
+    text = instructions(context_variables) if callable(instructions) else instructions
+    return [{"role": "system", "content": text}] + history
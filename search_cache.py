@@ -0,0 +1,317 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Optional
+
+_MISSING = object()
+
+INDEX_STATS_FILTER_PATH = (
+    "indices.*.primaries.docs,"
+    "indices.*.shards.*.routing.primary,"
+    "indices.*.shards.*.seq_no.max_seq_no"
+)
+
+
+def cache_key(namespace: str, query: str, **params: Any) -> str:
+    """Build a stable cache key from the query text and search parameters.
+
+    Whitespace in the query is collapsed; case is kept because query_string
+    operators (AND, OR, NOT) are case-sensitive.
+    """
+    payload = json.dumps(
+        {"namespace": namespace, "query": " ".join(query.split()), "params": params},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryCacheBackend:
+    """In-process LRU store with per-entry expiry."""
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCacheBackend:
+    """SQLite store that several worker processes can share through one file.
+
+    Values must be JSON-serializable. Least recently used entries are evicted
+    once `table` grows past `max_size`.
+    """
+
+    def __init__(self, path: str, table: str = "cache", max_size: int = 10000):
+        self.path = path
+        self.table = table
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Any:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return _MISSING
+            if row[1] <= now:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._conn.commit()
+                return _MISSING
+            self._conn.execute(
+                f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, default=str), now + ttl, now),
+            )
+            self._conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,))
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f"SELECT key FROM {self.table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_size,),
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+
+class SearchCache:
+    """Bounded TTL cache with hit/miss counters and single-flight loading.
+
+    Concurrent lookups of the same missing key share one call to `compute`
+    instead of each sending their own request. A caller that is cancelled
+    while waiting leaves the shared async load running for the others.
+    """
+
+    def __init__(self, backend=None, ttl: float = 300):
+        self.backend = backend or MemoryCacheBackend()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._async_in_flight = {}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self.backend.get(key)
+        with self._lock:
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self.backend.set(key, value, self.ttl)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        # The backend is checked under the lock too: a leader stores its value
+        # before leaving _in_flight, so a caller that finds no load in flight
+        # either sees that value or is the first to miss
+        with self._lock:
+            future: Optional[Future] = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                value = self.backend.get(key)
+                if value is not _MISSING:
+                    self.hits += 1
+                    return value
+                future = Future()
+                self._in_flight[key] = future
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = compute()
+            self.set(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    async def aget_or_compute(
+        self, key: str, compute: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        # Nothing awaits between the checks below, so on one event loop they
+        # are atomic; the lock only guards the counters shared with threads
+        future = self._async_in_flight.get(key)
+        if future is not None:
+            with self._lock:
+                self.coalesced += 1
+            return await asyncio.shield(future)
+
+        value = self.backend.get(key)
+        with self._lock:
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+            self.misses += 1
+
+        # The load runs as its own task that every caller, the first one
+        # included, awaits through shield: a caller that is cancelled (say its
+        # client disconnected) stops waiting without cancelling the others
+        task = asyncio.ensure_future(self._aload(key, compute))
+        task.add_done_callback(_retrieve_exception)
+        self._async_in_flight[key] = task
+        return await asyncio.shield(task)
+
+    async def _aload(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await compute()
+            self.set(key, value)
+            return value
+        finally:
+            self._async_in_flight.pop(key, None)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses, coalesced = self.hits, self.misses, self.coalesced
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "coalesced": coalesced,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "size": len(self.backend),
+        }
+
+
+def _retrieve_exception(task: asyncio.Future) -> None:
+    # Mark a failed load's exception as retrieved when every caller left
+    if not task.cancelled():
+        task.exception()
+
+
+class IndexVersion:
+    """Cheap fingerprint of an index's contents, used to invalidate cached results.
+
+    The fingerprint combines the concrete index names behind the alias with
+    their primary doc and deletion counts and the max sequence number of each
+    primary shard, so it changes whenever documents are written or the alias
+    is swapped to a fresh index. Sequence numbers are persisted with the
+    shard, so unlike the per-node indexing counters they survive node restarts
+    and shard relocations. The cluster is asked at most once every `interval`
+    seconds.
+    """
+
+    def __init__(self, client, index: str, async_client=None, interval: float = 30):
+        self.client = client
+        self.async_client = async_client
+        self.index = index
+        self.interval = interval
+        self._value = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> str:
+        with self._lock:
+            if self._stale():
+                self._update(self.client.indices.stats(**self._stats_params()))
+            return self._value
+
+    async def acurrent(self) -> str:
+        if self._stale():
+            if self.async_client is None:
+                # Keep the blocking stats call off the event loop
+                return await asyncio.get_running_loop().run_in_executor(
+                    None, self.current
+                )
+            self._update(await self.async_client.indices.stats(**self._stats_params()))
+        return self._value
+
+    def _stale(self) -> bool:
+        return self._value is None or time.time() - self._checked_at >= self.interval
+
+    def _stats_params(self) -> dict:
+        return {
+            "index": self.index,
+            "metric": "docs",
+            "level": "shards",
+            "params": {"filter_path": INDEX_STATS_FILTER_PATH},
+        }
+
+    def _update(self, stats: dict) -> None:
+        fingerprint = []
+        for name, index_stats in sorted(stats["indices"].items()):
+            docs = index_stats["primaries"]["docs"]
+            max_seq_nos = sorted(
+                (int(shard), copy["seq_no"]["max_seq_no"])
+                for shard, copies in index_stats.get("shards", {}).items()
+                for copy in copies
+                if copy["routing"]["primary"]
+            )
+            fingerprint.append([name, docs["count"], docs["deleted"], max_seq_nos])
+        self._value = hashlib.sha256(json.dumps(fingerprint).encode("utf-8")).hexdigest()
+        self._checked_at = time.time()
@@ -0,0 +1,69 @@
+import json
+import os
+
+from typing import Iterable, List, Sequence, Tuple
+
+from langchain_core.documents import Document
+from tokens import count_tokens
+
+DEFAULT_FIELDS = ("title", "alternative_title", "description")
+
+
+def _text(value, max_chars: int):
+    if isinstance(value, (list, tuple)):
+        value = " | ".join(str(item) for item in value if item)
+    value = " ".join(str(value).split())
+    if max_chars and len(value) > max_chars:
+        value = value[: max_chars - 1].rstrip() + "…"
+    return value
+
+
+def compact_hit(
+    document: Document,
+    score: float,
+    fields: Sequence[str] = DEFAULT_FIELDS,
+    max_field_chars: int = 300,
+) -> dict:
+    """Project one search hit onto `fields`, with long text truncated.
+
+    `page_content` holds the work id, which is also in the metadata, so it is
+    emitted once as `id`. Empty fields are left out.
+    """
+    hit = {"id": document.metadata.get("id", document.page_content)}
+    for field in fields:
+        value = document.metadata.get(field)
+        if value in (None, "", [], ()):
+            continue
+        hit[field] = _text(value, max_field_chars)
+    hit["score"] = round(float(score), 4)
+    return hit
+
+
+def compact_results(
+    docs_with_scores: Iterable[Tuple[Document, float]],
+    fields: Sequence[str] = DEFAULT_FIELDS,
+    max_field_chars: int = int(os.getenv("SEARCH_RESULT_FIELD_CHARS", "300")),
+    max_tokens: int = int(os.getenv("SEARCH_RESULT_MAX_TOKENS", "3000")),
+) -> str:
+    """Serialize search hits as compact JSON that fits in `max_tokens`.
+
+    Hits keep their rank order; when the budget is exceeded the lowest-scoring
+    hits are dropped first and counted in `omitted`.
+    """
+    hits: List[dict] = [
+        compact_hit(document, score, fields, max_field_chars)
+        for document, score in docs_with_scores
+    ]
+    encoded = [json.dumps(hit, ensure_ascii=False, separators=(",", ":")) for hit in hits]
+    sizes = [count_tokens(hit) for hit in encoded]
+
+    keep = set(range(len(hits)))
+    total = sum(sizes)
+    for index in sorted(keep, key=lambda i: hits[i]["score"]):
+        if total <= max_tokens:
+            break
+        keep.remove(index)
+        total -= sizes[index]
+
+    results = ",".join(encoded[i] for i in range(len(hits)) if i in keep)
+    return f'{{"results":[{results}],"omitted":{len(hits) - len(keep)}}}'
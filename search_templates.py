@@ -0,0 +1,100 @@
+"""Server-side search pipeline and search template for the hybrid query.
+
+In managed mode the normalization pipeline and a mustache template of the
+hybrid query are registered on the cluster once, and every search sends only
+the template id and its parameters (`query`, `k`, `size`, `model_id`).
+
+Both are versioned by a hash of their definitions, so registering is
+idempotent and a changed definition gets a new id instead of replacing the
+one running requests use.
+
+    uv run search_templates.py   # register and print the ids
+"""
+
+import hashlib
+import json
+
+from hybrid_query import hybrid_query, search_pipeline
+from opensearch_neural_search import SOURCE_FIELDS
+from opensearchpy import NotFoundError
+
+TEMPLATE_PARAMS = ("query", "k", "size", "model_id")
+
+
+def search_template_source(vector_field: str = "embedding") -> str:
+    """Mustache source of the hybrid query with its parameters left open."""
+    dsl = hybrid_query(
+        query="@@query@@",
+        model_id="@@model_id@@",
+        vector_field=vector_field,
+        k="@@k@@",
+        size="@@size@@",
+    )
+    # The normalization runs in the registered pipeline instead
+    del dsl["search_pipeline"]
+    dsl["_source"] = SOURCE_FIELDS
+
+    source = json.dumps(dsl, separators=(",", ":"))
+    # Strings stay quoted (mustache JSON-escapes them); numbers must not be
+    for name in TEMPLATE_PARAMS:
+        if name in ("query", "model_id"):
+            source = source.replace(f"@@{name}@@", "{{" + name + "}}")
+        else:
+            source = source.replace(f'"@@{name}@@"', "{{" + name + "}}")
+    return source
+
+
+def definition_version(template_source: str, pipeline: dict) -> str:
+    digest = hashlib.sha256(
+        json.dumps([template_source, pipeline], sort_keys=True).encode()
+    )
+    return digest.hexdigest()[:8]
+
+
+def register_search_template(
+    client, name: str = "hybrid-search", vector_field: str = "embedding"
+):
+    """Create or update the search pipeline and template; return their ids."""
+    source = search_template_source(vector_field)
+    pipeline = search_pipeline()
+    version = definition_version(source, pipeline)
+    template_id = f"{name}-template-{version}"
+    pipeline_id = f"{name}-pipeline-{version}"
+
+    pipeline["description"] = f"Hybrid search score normalization ({version})"
+    _ensure_pipeline(client, pipeline_id, pipeline)
+    _ensure_template(client, template_id, source)
+    return template_id, pipeline_id
+
+
+def _ensure_pipeline(client, pipeline_id: str, pipeline: dict) -> None:
+    try:
+        current = client.search_pipeline.get(id=pipeline_id).get(pipeline_id)
+    except NotFoundError:
+        current = None
+    if current == pipeline:
+        return
+    client.search_pipeline.put(id=pipeline_id, body=pipeline)
+    print(f"Registered search pipeline {pipeline_id}")
+
+
+def _ensure_template(client, template_id: str, source: str) -> None:
+    try:
+        current = client.get_script(id=template_id).get("script", {}).get("source")
+    except NotFoundError:
+        current = None
+    if current == source:
+        return
+    client.put_script(
+        id=template_id, body={"script": {"lang": "mustache", "source": source}}
+    )
+    print(f"Registered search template {template_id}")
+
+
+if __name__ == "__main__":
+    from opensearch_client import opensearch_client, prefix
+
+    template_id, pipeline_id = register_search_template(
+        opensearch_client(), name=prefix("hybrid-search")
+    )
+    print(f"Search template: {template_id}, search pipeline: {pipeline_id}")
@@ -0,0 +1,118 @@
+import threading
+import time
+
+from typing import List, Optional
+
+import numpy as np
+
+import tracing
+
+from embeddings import QueryEmbedder
+from search_cache import IndexVersion
+
+
+class SemanticCache:
+    """Final answers keyed by question embeddings, matched by cosine similarity.
+
+    A lookup is one brute-force dot product over the unit vectors of every
+    entry, which stays sub-millisecond at the few thousand entries
+    `max_entries` allows. Entries expire after `ttl` seconds, and the whole
+    cache is dropped when `index_version` changes, so answers never outlive the
+    documents they were grounded in. `invalidate()` drops it on demand.
+    """
+
+    def __init__(
+        self,
+        embedder: QueryEmbedder,
+        threshold: float = 0.95,
+        ttl: float = 3600,
+        max_entries: int = 2000,
+        index_version: IndexVersion = None,
+    ):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.index_version = index_version
+        self.hits = self.misses = 0
+        self._vectors = None
+        self._answers: List[str] = []
+        self._expires = np.empty(0)
+        self._version = None
+        self._lock = threading.Lock()
+
+    def lookup(self, question: str) -> Optional[str]:
+        """Return the cached answer to a question close enough to `question`."""
+        with tracing.span("semantic_cache.lookup") as span:
+            if self.index_version is not None:
+                self._check_version(self.index_version.current())
+            return self._match(self.embedder.embed(question), span)
+
+    async def alookup(self, question: str) -> Optional[str]:
+        with tracing.span("semantic_cache.lookup") as span:
+            if self.index_version is not None:
+                self._check_version(await self.index_version.acurrent())
+            return self._match(await self.embedder.aembed(question), span)
+
+    def store(self, question: str, answer: str) -> None:
+        self._add(self.embedder.embed(question), answer)
+
+    async def astore(self, question: str, answer: str) -> None:
+        self._add(await self.embedder.aembed(question), answer)
+
+    def invalidate(self) -> None:
+        """Drop every entry, e.g. after the index has been updated."""
+        with self._lock:
+            self._vectors = None
+            self._answers = []
+            self._expires = np.empty(0)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._answers),
+        }
+
+    def _check_version(self, version: str) -> None:
+        if version != self._version:
+            if self._version is not None:
+                self.invalidate()
+            self._version = version
+
+    def _match(self, vector: List[float], span) -> Optional[str]:
+        query = _unit(vector)
+        with self._lock:
+            if self._answers:
+                similarities = self._vectors @ query
+                similarities[self._expires <= time.time()] = -1.0
+                best = int(np.argmax(similarities))
+                span.set(similarity=round(float(similarities[best]), 4))
+                if similarities[best] >= self.threshold:
+                    self.hits += 1
+                    span.set(hit=True)
+                    return self._answers[best]
+            self.misses += 1
+            span.set(hit=False)
+            return None
+
+    def _add(self, vector: List[float], answer: str) -> None:
+        row = _unit(vector)[np.newaxis, :]
+        with self._lock:
+            # Entries are kept in insertion order, so expired and overflowing
+            # ones are dropped from the front
+            keep = np.flatnonzero(self._expires > time.time())
+            keep = keep[max(0, len(keep) - self.max_entries + 1) :]
+            self._vectors = (
+                np.vstack([self._vectors[keep], row]) if len(keep) else row
+            )
+            self._answers = [self._answers[i] for i in keep] + [answer]
+            self._expires = np.append(self._expires[keep], time.time() + self.ttl)
+
+
+def _unit(vector: List[float]) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
@@ -0,0 +1,114 @@
+import os
+import threading
+
+
+class lazy:
+    """Build an attribute on first access and reuse it for the life of the instance.
+
+    Unlike functools.cached_property, the first build is guarded by a lock so
+    concurrent callers never create two clients.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.name = factory.__name__
+        self.__doc__ = factory.__doc__
+        self._lock = threading.RLock()
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        with self._lock:
+            if self.name not in instance.__dict__:
+                instance.__dict__[self.name] = self.factory(instance)
+        return instance.__dict__[self.name]
+
+
+class Services:
+    """Lazily initialized clients shared by the agents.
+
+    Nothing here is built, and no credentials or network calls are made, until
+    an attribute is first read. Modules import the `services` singleton below
+    instead of constructing clients at import time.
+    """
+
+    @lazy
+    def opensearch_client(self):
+        """Blocking OpenSearch client."""
+        from opensearch_client import opensearch_client
+
+        return opensearch_client()
+
+    @lazy
+    def opensearch_async_client(self):
+        """AsyncOpenSearch client for the async search path."""
+        from opensearch_client import opensearch_async_client
+
+        return opensearch_async_client()
+
+    @lazy
+    def opensearch_vector_store(self):
+        """OpenSearchNeuralSearch over the works index."""
+        from opensearch_client import opensearch_vector_store
+
+        return opensearch_vector_store(
+            client=self.opensearch_client, async_client=self.opensearch_async_client
+        )
+
+    @lazy
+    def semantic_cache(self):
+        """Answers to earlier questions, looked up by question embedding."""
+        from opensearch_client import semantic_cache
+
+        return semantic_cache(self.opensearch_vector_store)
+
+    @lazy
+    def azure_client(self):
+        """AzureOpenAI client authenticated with the default Azure credential."""
+        from client import azure_client
+
+        return azure_client()
+
+    @lazy
+    def swarm(self):
+        """Swarm client running on the Azure OpenAI client."""
+        from client import swarm_client
+
+        return swarm_client(self.azure_client)
+
+    @lazy
+    def chat_model(self):
+        """AzureChatOpenAI model used by the LangGraph agent."""
+        from langgraph_agents.model import chat_model
+
+        return chat_model()
+
+    def transport_metrics(self):
+        """Connection pool utilization of the OpenSearch clients built so far."""
+        from opensearch_client import transport_metrics
+
+        return {
+            name: transport_metrics(vars(self)[name])
+            for name in ("opensearch_client", "opensearch_async_client")
+            if name in vars(self)
+        }
+
+    def prewarm(self):
+        """Build the vector store now if AGGREGATION_PREWARM_FIELDS asks for it.
+
+        Building the store starts the background aggregation prewarm, which
+        otherwise waits for the first search. Entry points call this at startup.
+        """
+        if not os.getenv("AGGREGATION_PREWARM_FIELDS"):
+            return
+        try:
+            self.opensearch_vector_store
+        except Exception as e:
+            print(f"Aggregation prewarm skipped: {e!r}")
+
+    def built(self):
+        """Names of the services that have been initialized so far."""
+        return [name for name in vars(self) if not name.startswith("_")]
+
+
+services = Services()
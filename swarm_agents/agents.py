@@ -1,6 +1,6 @@
 import os
 
-from client import client
+from services import services
 from swarm import Agent
 
 def main():
@@ -18,7 +18,7 @@ def main():
         instructions="Only speak in Haikus.",
     )
 
-    response = client.run(
+    response = services.swarm.run(
         agent=agent_a,
         messages=[{"role": "user", "content": "I want to talk to agent B."}],
         model_override=os.getenv("AZURE_DEPLOYMENT_NAME"),
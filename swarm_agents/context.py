@@ -0,0 +1,136 @@
+import json
+import threading
+
+from collections import OrderedDict
+from functools import cache
+
+from swarm.util import function_to_json
+from tokens import count_message_tokens, count_tokens
+
+
+class SourceStore:
+    """Full search records kept out of the prompt, keyed by work id.
+
+    Agents only see short references to these records; tools fetch the full
+    metadata on demand. The store is bounded and evicts the least recently
+    stored records first.
+    """
+
+    def __init__(self, max_records: int = 1000):
+        self.max_records = max_records
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, record_id: str, record: dict) -> None:
+        with self._lock:
+            self._records[record_id] = record
+            self._records.move_to_end(record_id)
+            while len(self._records) > self.max_records:
+                self._records.popitem(last=False)
+
+    def get(self, record_id: str):
+        with self._lock:
+            return self._records.get(record_id)
+
+
+source_store = SourceStore()
+
+
+def _summary(text, limit: int = 80) -> str:
+    text = " ".join(str(text or "").split())
+    return text if len(text) <= limit else text[: limit - 1] + "…"
+
+
+def store_sources(context_variables: dict, documents) -> list:
+    """Keep full documents out-of-band and put id + short title references in context."""
+    references = []
+    for document in documents:
+        record = dict(document.metadata)
+        record_id = str(record.get("id") or document.page_content)
+        source_store.put(record_id, record)
+        references.append({"id": record_id, "title": _summary(record.get("title"))})
+    context_variables["source"] = references
+    return references
+
+
+def source_references(context_variables: dict) -> str:
+    """Render the current source references for an agent's instructions."""
+    references = context_variables.get("source") or []
+    if not references:
+        return "none"
+    return "\n".join(f"- {ref['id']}: {ref['title']}" for ref in references)
+
+
+def source_records(record_ids) -> list:
+    """Look up full records for the given ids, skipping unknown ones."""
+    return [
+        record
+        for record in (source_store.get(str(record_id)) for record_id in record_ids)
+        if record is not None
+    ]
+
+
+def trim_messages(messages: list, max_tokens: int, keep_last: int = 2) -> list:
+    """Trim conversation history to `max_tokens`, oldest messages first.
+
+    The newest `keep_last` messages are always kept, and a tool result is never
+    kept without the assistant message that requested it. Dropped user turns
+    are summarized in one leading system note, which gets an eighth of the
+    budget, so the agent keeps the gist.
+    """
+    counts = [count_message_tokens([message]) for message in messages]
+    total = sum(counts)
+    if total <= max_tokens:
+        return messages
+
+    note_budget = max_tokens // 8
+    start = 0
+    limit = max(len(messages) - keep_last, 0)
+    while start < limit and total > max_tokens - note_budget:
+        total -= counts[start]
+        start += 1
+    # Never begin with tool results whose assistant tool_calls were dropped
+    while start < len(messages) and messages[start].get("role") == "tool":
+        start += 1
+
+    dropped = [
+        _summary(message.get("content"), 100)
+        for message in messages[:start]
+        if message.get("role") == "user" and message.get("content")
+    ]
+    kept = messages[start:]
+    while dropped:
+        note = {
+            "role": "system",
+            "content": "Earlier in this conversation the user asked: "
+            + "; ".join(dropped),
+        }
+        if count_message_tokens([note]) <= note_budget:
+            return [note] + kept
+        dropped.pop(0)
+    return kept
+
+
+def prompt_tokens(agent, messages: list, context_variables: dict) -> int:
+    """Estimate the prompt tokens of the next completion for `agent`.
+
+    Counts the instructions, the messages and the tool schemas that are sent
+    with every request.
+    """
+    instructions = (
+        agent.instructions(context_variables)
+        if callable(agent.instructions)
+        else agent.instructions
+    )
+    return (
+        count_tokens(instructions)
+        + count_message_tokens(messages)
+        + _tool_tokens(tuple(agent.functions))
+    )
+
+
+@cache
+def _tool_tokens(functions: tuple) -> int:
+    if not functions:
+        return 0
+    return count_tokens(json.dumps([function_to_json(f) for f in functions]))
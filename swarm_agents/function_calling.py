@@ -1,6 +1,6 @@
 import os
 
-from client import client
+from services import services
 from swarm import Agent
 
 
@@ -19,13 +19,19 @@ agent = Agent(
     functions=[get_weather],
 )
 
-messages = [{"role": "user", "content": "What's the weather in Buffalo Grove?"}]
 
-response = client.run(
-    agent=agent, 
-    messages=messages, 
-    model_override=os.getenv("AZURE_DEPLOYMENT_NAME"),
-    debug=True,
-)
+def main():
+    messages = [{"role": "user", "content": "What's the weather in Buffalo Grove?"}]
+
+    response = services.swarm.run(
+        agent=agent,
+        messages=messages,
+        model_override=os.getenv("AZURE_DEPLOYMENT_NAME"),
+        debug=True,
+    )
+
+    print(response.messages[-1]["content"])
+
 
-print(response.messages[-1]["content"])
\ No newline at end of file
+if __name__ == "__main__":
+    main()
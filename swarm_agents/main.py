@@ -1,17 +1,26 @@
 import json
 
-from opensearch_client import opensearch_vector_store
-
+from prompts import LayeredInstructions
+from search_results import compact_results
+from services import services
 from swarm import Agent
+from swarm_agents.context import source_records, source_references, store_sources
 from utils import run_demo_loop
 
 
 def similarity_search(context_variables, query):
     """Query the search index for relevant documents."""
     print(f"Searching with query: {query}")
-    query_results = opensearch_vector_store.similarity_search(query, size=20)
-    context_variables["source"] = query_results
-    return json.dumps(query_results, default=str)
+    query_results = services.opensearch_vector_store.similarity_search_with_score(query, size=20)
+    store_sources(context_variables, [document for document, _ in query_results])
+    return compact_results(query_results)
+
+
+def get_source_records(context_variables, ids):
+    """Fetch the full metadata of source records by id (comma-separated)."""
+    return json.dumps(
+        source_records(record_id.strip() for record_id in ids.split(",")), default=str
+    )
 
 
 def flag_problematic_records(context_variables):
@@ -43,14 +52,22 @@ def transfer_to_triage():
     return triage_agent
 
 
-def triage_instructions(context_variables):
+# Instructions are split into static text, sent first so the provider's prompt
+# cache can reuse it, and per-turn context, sent after the conversation
+def triage_context(context_variables):
     name = context_variables.get("name", "friend")
-    return f"""You are to triage a user's request, and call a tool to transfer to the right intent.
+    return f"The user context is here: {name}"
+
+
+triage_instructions = LayeredInstructions(
+    """You are to triage a user's request, and call a tool to transfer to the right intent.
 Once you are ready to transfer to the right intent, call the tool to transfer to the right intent.
 You don't need to know specifics, just the topic of the request.
 When you need more information to triage the request to an agent, ask a direct question without explaining why you're asking it.
 Do not share your thought process with the user! Do not make unreasonable assumptions on behalf of user.
-The user context is here: {name}"""
+The user context is given at the end of the conversation.""",
+    triage_context,
+)
 
 
 triage_agent = Agent(
@@ -60,12 +77,20 @@ triage_agent = Agent(
 )
 
 
-def search_agent_instructions(context_variables):
-    source = context_variables.get("source", None)
-    return f"""You are a search agent. Your current source information is: {source}
+def sources_context(context_variables):
+    source = source_references(context_variables)
+    return f"""Your current sources (id: title) are:
+{source}"""
+
+
+search_agent_instructions = LayeredInstructions(
+    """You are a search agent. Your current sources are listed at the end of the conversation.
+Use get_source_records to read the full metadata of a source.
 Ask clarifying questions to make sure you know the user's search intent if necessary. 
 Queries are stored in your context when the function is called. 
-If you already have the proper sources in context, transfer to the appropriate agent."""
+If you already have the proper sources in context, transfer to the appropriate agent.""",
+    sources_context,
+)
 
 
 search_agent = Agent(
@@ -75,25 +100,29 @@ search_agent = Agent(
         transfer_to_triage,
         transfer_to_formatter,
         similarity_search,
+        get_source_records,
         mark_as_approved,
     ],
 )
 
 
-def formatter_instructions(context_variables):
-    source = context_variables.get("source", None)
-    return f"""You are a formatter agent. Your current source information is: {source}
-Format the source documents according to the user's instructions. Focus only on the source information that is relevant to the user's request."""
+formatter_instructions = LayeredInstructions(
+    """You are a formatter agent. Your current sources are listed at the end of the conversation.
+Use get_source_records to read the full metadata of the sources you need.
+Format the source documents according to the user's instructions. Focus only on the source information that is relevant to the user's request.""",
+    sources_context,
+)
 
 
 formatter_agent = Agent(
     name="Formatter Agent",
     instructions=formatter_instructions,
-    functions=[transfer_to_triage],
+    functions=[transfer_to_triage, get_source_records],
 )
 
 
 def main():
+    services.prewarm()
     run_demo_loop(
         context_variables={"name": "Brendan"},
         starting_agent=triage_agent,
@@ -1,4 +1,4 @@
-from opensearch_client import opensearch_vector_store
+from services import services
 
 def test_aggregations_search():
     # Terms Aggregation on `genre.label` with Sub-Aggregation on `style_period.label`
@@ -20,7 +20,7 @@ def test_aggregations_search():
     }
     
     try:
-        results_genres = opensearch_vector_store.aggregations_search(aggregations_genres)
+        results_genres = services.opensearch_vector_store.aggregations_search(aggregations_genres)
         print("Genres with Style Periods Aggregation Results:", results_genres)
     except Exception as e:
         print(f"An error occurred in Genres Aggregation: {e}")
@@ -37,7 +37,7 @@ def test_aggregations_search():
     }
     
     try:
-        results_creation_dates = opensearch_vector_store.aggregations_search(aggregations_creation_dates)
+        results_creation_dates = services.opensearch_vector_store.aggregations_search(aggregations_creation_dates)
         print("Creation Dates Aggregation Results:", results_creation_dates)
     except Exception as e:
         print(f"An error occurred in Creation Dates Aggregation: {e}")
@@ -52,7 +52,7 @@ def test_aggregations_search():
     }
     
     try:
-        results_unique_creators = opensearch_vector_store.aggregations_search(aggregations_unique_creators)
+        results_unique_creators = services.opensearch_vector_store.aggregations_search(aggregations_unique_creators)
         print("Unique Creators Aggregation Results:", results_unique_creators)
     except Exception as e:
         print(f"An error occurred in Unique Creators Aggregation: {e}")
@@ -67,7 +67,7 @@ def test_aggregations_search():
     }
     
     try:
-        results_average_embedding = opensearch_vector_store.aggregations_search(aggregations_average_embedding)
+        results_average_embedding = services.opensearch_vector_store.aggregations_search(aggregations_average_embedding)
         print("Average Embedding Length Aggregation Results:", results_average_embedding)
     except Exception as e:
         print(f"An error occurred in Average Embedding Length Aggregation: {e}")
@@ -91,7 +91,7 @@ def test_aggregations_search():
     }
     
     try:
-        results_genres_top_works = opensearch_vector_store.aggregations_search(aggregations_genres_top_works)
+        results_genres_top_works = services.opensearch_vector_store.aggregations_search(aggregations_genres_top_works)
         print("Genres Top Works Aggregation Results:", results_genres_top_works)
     except Exception as e:
         print(f"An error occurred in Genres Top Works Aggregation: {e}")
@@ -111,7 +111,7 @@ def test_aggregations_search():
     }
     
     try:
-        results_embedding_length_ranges = opensearch_vector_store.aggregations_search(aggregations_embedding_length_ranges)
+        results_embedding_length_ranges = services.opensearch_vector_store.aggregations_search(aggregations_embedding_length_ranges)
         print("Embedding Length Ranges Aggregation Results:", results_embedding_length_ranges)
     except Exception as e:
         print(f"An error occurred in Embedding Length Ranges Aggregation: {e}")
@@ -0,0 +1,43 @@
+import json
+
+from functools import cache
+
+# Per-message overhead of the chat format (role, separators), as documented
+# for OpenAI chat models
+MESSAGE_OVERHEAD = 3
+
+
+@cache
+def _encoding():
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # tiktoken missing, or its vocabulary can't be downloaded offline
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with the local tokenizer, or estimate ~4 characters per token."""
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages) -> int:
+    """Count the prompt tokens of a list of chat messages (dicts)."""
+    total = 0
+    for message in messages:
+        total += MESSAGE_OVERHEAD
+        content = message.get("content")
+        if isinstance(content, str):
+            total += count_tokens(content)
+        elif content:
+            total += count_tokens(json.dumps(content, default=str))
+        if message.get("tool_calls"):
+            total += count_tokens(json.dumps(message["tool_calls"], default=str))
+    return total
@@ -0,0 +1,188 @@
+"""Nested timing spans for agent turns, tool calls and OpenSearch requests.
+
+Tracing is off unless TRACING is set:
+
+    TRACING=jsonl   append one JSON object per finished span to TRACING_PATH
+                    (default .cache/traces.jsonl), in OpenTelemetry's field names
+    TRACING=otel    forward spans to the OpenTelemetry tracer provider configured
+                    in this process (requires opentelemetry-api/sdk)
+
+When tracing is off `span()` returns a shared no-op span, so instrumented code
+pays for one global lookup and a method call.
+"""
+
+import contextvars
+import json
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_current = contextvars.ContextVar("tracing_span", default=None)
+
+
+class _NoopSpan:
+    recording = False
+
+    def set(self, **attributes):
+        return self
+
+    def incr(self, name, amount=1):
+        return self
+
+    def get(self, name, default=None):
+        return default
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    recording = True
+
+    def __init__(self, name: str, attributes: dict, parent=None, exporter=None):
+        self.name = name
+        self.attributes = attributes
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.status = "OK"
+        self.start_ns = self.end_ns = 0
+        self.otel = None
+        self._exporter = exporter
+        self._token = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+        return self
+
+    def incr(self, name, amount=1):
+        self.attributes[name] = self.attributes.get(name, 0) + amount
+        return self
+
+    def get(self, name, default=None):
+        return self.attributes.get(name, default)
+
+    def __enter__(self):
+        self.start_ns = time.time_ns()
+        self._token = _current.set(self)
+        self._exporter.start(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        if exc is not None:
+            self.status = "ERROR"
+            self.attributes["error"] = repr(exc)
+        _current.reset(self._token)
+        self._exporter.end(self)
+        return False
+
+    def to_dict(self) -> dict:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent.span_id if self.parent else None,
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "durationMs": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "status": {"code": self.status},
+        }
+
+
+class JsonlExporter:
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def start(self, span: Span):
+        pass
+
+    def end(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line)
+            self._file.flush()
+
+
+class OtelExporter:
+    def __init__(self):
+        from opentelemetry import trace
+
+        self.trace = trace
+        self.tracer = trace.get_tracer("genai-template")
+
+    def start(self, span: Span):
+        parent = span.parent.otel if span.parent is not None else None
+        context = self.trace.set_span_in_context(parent) if parent else None
+        span.otel = self.tracer.start_span(
+            span.name, context=context, start_time=span.start_ns
+        )
+
+    def end(self, span: Span):
+        span.otel.set_attributes(
+            {
+                key: value
+                for key, value in span.attributes.items()
+                if isinstance(value, (str, bool, int, float))
+            }
+        )
+        if span.status == "ERROR":
+            span.otel.set_status(self.trace.StatusCode.ERROR)
+        span.otel.end(end_time=span.end_ns)
+
+
+_exporter = None
+
+
+def configure(mode=None, path=None):
+    """Switch tracing on or off; defaults come from TRACING and TRACING_PATH."""
+    global _exporter
+    mode = (mode or os.getenv("TRACING", "off")).lower()
+    if mode == "jsonl":
+        _exporter = JsonlExporter(
+            path or os.getenv("TRACING_PATH", ".cache/traces.jsonl")
+        )
+    elif mode == "otel":
+        try:
+            _exporter = OtelExporter()
+        except ImportError:
+            print("TRACING=otel requires opentelemetry-api; tracing disabled")
+            _exporter = None
+    else:
+        _exporter = None
+    return _exporter
+
+
+def enabled() -> bool:
+    return _exporter is not None
+
+
+def span(name: str, **attributes):
+    """Time a block as a child of the current span: `with span("name", key=value) as s:`."""
+    if _exporter is None:
+        return NOOP_SPAN
+    return Span(name, attributes, _current.get(), _exporter)
+
+
+def current_span():
+    """The innermost open span, or the no-op span."""
+    return _current.get() or NOOP_SPAN
+
+
+configure()
@@ -1,8 +1,11 @@
+import accounting
 import json
 import os
 import time
+import uuid
 
-from client import client
+from services import services
+from swarm_agents.context import prompt_tokens, trim_messages
 
 
 def process_and_print_streaming_response(response):
@@ -64,31 +67,52 @@ def run_demo_loop(
     context_variables=None,
     stream=False,
     debug=False,
+    max_prompt_tokens=int(os.getenv("SWARM_MAX_PROMPT_TOKENS", "8000")),
 ) -> None:
     print("Starting Swarm CLI 🐝")
 
     messages = []
     agent = starting_agent
     context = context_variables or {}
+    # Usage of this session is recorded under one thread id
+    session_id = uuid.uuid4().hex
 
     while True:
         user_input = input("User message: ")
         messages.append({"role": "user", "content": user_input})
 
-        response = client.run(
-            agent=agent,
-            messages=messages,
-            context_variables=context,
-            stream=stream,
-            debug=debug,
-            model_override=os.getenv("AZURE_DEPLOYMENT_NAME"),
+        # Keep the history within the budget left after instructions and tools
+        instructions_tokens = prompt_tokens(agent, [], context)
+        messages = trim_messages(messages, max_prompt_tokens - instructions_tokens)
+        print(
+            f"\033[90m[prompt tokens: {prompt_tokens(agent, messages, context)}]\033[0m"
         )
 
-        if stream:
-            response_content = process_and_print_streaming_response(response)
-        else:
-            pretty_print_messages(response.messages)
-            response_content = response.messages[-1]["content"]
+        with accounting.thread_scope(session_id):
+            response = services.swarm.run(
+                agent=agent,
+                messages=messages,
+                context_variables=context,
+                stream=stream,
+                debug=debug,
+                model_override=os.getenv("AZURE_DEPLOYMENT_NAME"),
+            )
+
+            # A streamed run only makes its calls while it is consumed
+            if stream:
+                response_content = process_and_print_streaming_response(response)
+            else:
+                pretty_print_messages(response.messages)
+                response_content = response.messages[-1]["content"]
+
+        # Cumulative prompt cache hits, to check the prompt layout pays off
+        usage = getattr(services.swarm, "usage", None)
+        if usage and usage["prompt_tokens"]:
+            print(
+                f"\033[90m[cached prompt tokens: {usage['cached_tokens']}"
+                f"/{usage['prompt_tokens']} ({services.swarm.cache_hit_ratio():.0%})]"
+                "\033[0m"
+            )
 
         if hasattr(response, "context_variables") and response.context_variables:
             context.update(response.context_variables)